@@ -1,16 +1,20 @@
+import contextlib
+import json
 import socket
-import random
 import time
-import hashlib
-from cryptography.fernet import Fernet
-import base64
 import os
-import cirq
+import sys
+import traceback
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from qkd import checkpoint, engine, links, protocols, randomness, session
 
 HOST = '127.0.0.1'
 PORT = 65432
 
 def prepare_qubit(bit, basis):
+    # cirq takes seconds to import and only this reference circuit needs it
+    import cirq
     q = cirq.LineQubit(0)
     circuit = cirq.Circuit()
     if bit == 1:
@@ -20,102 +24,171 @@ def prepare_qubit(bit, basis):
     # No measurement here; just return the circuit and qubit
     return circuit, q
 
-def main():
-    # Read config
-    n = 32  # fallback default
-    ERROR_CHECK_BITS = 5  # fallback default
-    config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../extras/qkd_config.txt")
+def run_connection(conn, config, journal, rng, key_rng, key_path, stats=None):
+    # One connection of a (possibly resumed) session; the protocol itself is
+    # qkd.engine.Alice. Returns "done", "aborted" or "dropped".
+    transport = engine.SocketTransport(conn)
     try:
-        with open(config_path) as f:
-            for line in f:
-                if line.startswith("#") or not line.strip():
-                    continue
-                if line.startswith("num_bits="):
-                    n = int(line.strip().split("=")[1])
-                if line.startswith("error_bits="):
-                    ERROR_CHECK_BITS = int(line.strip().split("=")[1])
-    except Exception:
-        pass
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        s.bind((HOST, PORT))
-        s.listen()
-        print("Alice: Waiting for Bob to connect...")
-        conn, addr = s.accept()
-        with conn:
-            print('Alice: Connected by', addr)
-            alice_bits = [random.randint(0,1) for _ in range(n)]
-            alice_bases = [random.choice(['Z', 'X']) for _ in range(n)]
-
-            # Prepare qubits using Cirq and send basis/bit to Bob
-            for bit, basis in zip(alice_bits, alice_bases):
-                circuit, q = prepare_qubit(bit, basis)
-                # Simulate the state preparation (no measurement)
-                simulator = cirq.Simulator()
-                result = simulator.simulate(circuit)
-                # For protocol, send basis and bit (as before)
-                message = f"{basis}|{bit}\n"
-                conn.sendall(message.encode('utf-8'))
-                time.sleep(0.1)
-            
-            # Receive Bob's bases
-            bob_bases_bytes = conn.recv(1024)
-            bob_bases = bob_bases_bytes.decode('utf-8').strip().split(',')
-            
-            shared_key = []
-            for a_bit, a_basis, b_basis in zip(alice_bits, alice_bases, bob_bases):
-                if a_basis == b_basis:
-                    shared_key.append(str(a_bit))
-                else:
-                    shared_key.append('x')
-            
-            print("Alice's bases: ", alice_bases)
-            print("Bob's bases:   ", bob_bases)
-            print("Shared key:    ", ''.join(k for k in shared_key if k != 'x'))
-
-            # Error estimation
-            sifted_key = [int(k) for k in shared_key if k != 'x']
-            # Use ERROR_CHECK_BITS from config
-            if len(sifted_key) < ERROR_CHECK_BITS:
-                print("Not enough sifted bits for error estimation. Aborting.")
-                return
-            
-            # Select indices for error estimation
-            sample_indices = random.sample(range(len(sifted_key)), ERROR_CHECK_BITS)
-            sample_bits = [sifted_key[i] for i in sample_indices]
+        alice = engine.Alice(config, rng, key_rng, journal, os.path.dirname(os.path.abspath(__file__)))
+        result = alice.run(transport, key_path, stats)
+    finally:
+        transport.close()
+    if result == "done":
+        print("Final key saved to final_key_alice.txt")
+    return result
 
-            # Send sample indices to Bob
-            conn.sendall(('SAMPLE:' + ','.join(map(str, sample_indices)) + '\n').encode('utf-8'))
+def serve_connection(conn, config, index, store):
+    # Runs in a pool worker: one whole session on an accepted connection.
+    # Output goes to the session's log; the key is filed under the session
+    # id once Alice and Bob have agreed on it.
+    if config.get("seed") is not None:
+        # Seeded servers stay reproducible without handing every Bob the same key
+        config = dict(config, seed=config["seed"] + index)
+    rng = randomness.generator(config.get("seed"), "alice")
+    key_rng = randomness.source(config.get("seed"), "alice")
+    key_path = os.path.join(store, f"pending-{index}.txt")
+    log_path = os.path.join(store, f"pending-{index}.log")
+    stats = {"index": index, "session": None, "key_bits": 0}
+    start = time.perf_counter()
+    with conn, open(log_path, "w") as log, contextlib.redirect_stdout(log):
+        try:
+            stats["result"] = run_connection(conn, config, checkpoint.Journal(), rng, key_rng, key_path, stats)
+        except OSError as e:
+            print(f"Alice: Connection error ({e})")
+            stats["result"] = "dropped"
+        except Exception:
+            # Keep the traceback in the session's log and still file the session
+            traceback.print_exc(file=sys.stdout)
+            stats["result"] = "error"
+        # The server process still holds a copy of the socket; shutting it
+        # down here is what tells Bob the session is over
+        with contextlib.suppress(OSError):
+            conn.shutdown(socket.SHUT_RDWR)
+    stats["seconds"] = time.perf_counter() - start
+    name = stats["session"] or f"failed-{index}"
+    if stats["result"] == "done":
+        os.replace(key_path, os.path.join(store, f"{name}.txt"))
+    elif os.path.exists(key_path):
+        os.remove(key_path)
+    os.replace(log_path, os.path.join(store, f"{name}.log"))
+    return stats
 
-            # Receive Bob's bits
-            bob_sample_bytes = conn.recv(1024)
-            bob_sample_bits = list(map(int, bob_sample_bytes.decode('utf-8').strip().split(',')))
+async def serve(config, out_dir):
+    # serve=1: accept any number of Bobs and run their sessions side by side.
+    # The event loop only accepts connections and collects results; every
+    # session runs in a process pool worker, so block generation and sifting
+    # for different receivers use different cores.
+    import asyncio
+    from concurrent.futures import ProcessPoolExecutor
+    if config.get("auth", 0) or config.get("checkpoint", 0):
+        raise SystemExit("serve=1 does not support auth or checkpoint: both are per-peer state")
+    loop = asyncio.get_running_loop()
+    store = os.path.join(out_dir, "sessions")
+    os.makedirs(store, exist_ok=True)
+    # max_sessions=N stops the server after N sessions (0 serves until interrupted)
+    max_sessions = config.get("max_sessions", 0)
+    workers = config.get("workers", os.cpu_count())
+    totals = {"sessions": 0, "done": 0, "key_bits": 0}
+    start = time.perf_counter()
 
-            # Error rate
-            errors = sum(a != b for a, b in zip(sample_bits, bob_sample_bits))
-            error_rate = errors / ERROR_CHECK_BITS
-            print(f"Error estimation: {errors} errors out of {ERROR_CHECK_BITS} samples (rate: {error_rate:.2f})")
-            if error_rate > 0.2:
-                print("Error rate too high! Possible eavesdropping. Aborting.")
-                return
-            
-            # Remove sample bits from the final key
-            final_key = [str(sifted_key[i]) for i in range(len(sifted_key)) if i not in sample_indices]
-            print("Final key: ", ''.join(final_key))
+    async def run_session(pool, conn, addr, index):
+        began = time.perf_counter()
+        try:
+            stats = await loop.run_in_executor(pool, serve_connection, conn, config, index, store)
+        except Exception as e:
+            # The worker could not run the session at all (e.g. a broken
+            # pool); it still gets its metrics row
+            print(f"Alice: Session {index} failed: {e!r}")
+            stats = {"index": index, "session": None, "key_bits": 0, "result": "error",
+                     "seconds": time.perf_counter() - began}
+        finally:
+            conn.close()
+        stats["peer"] = links.describe(addr)
+        with open(os.path.join(store, "metrics.jsonl"), "a") as f:
+            f.write(json.dumps(stats) + "\n")
+        totals["sessions"] += 1
+        totals["done"] += stats["result"] == "done"
+        totals["key_bits"] += stats["key_bits"] if stats["result"] == "done" else 0
+        print(f"Alice: Session {stats['session'] or '-'} with {stats['peer']} {stats['result']}: "
+              f"{stats['key_bits']} key bits, QBER {stats.get('qber', 0.0):.4f}, {stats['seconds']:.2f} s")
 
-        # Existing: final_key is a list of '0'/'1' strings
-        final_key_str = ''.join(final_key)  # e.g., "1010101..."
+    listen_at = links.address(config, "qkd", config.get("port", PORT), HOST)
+    with links.listen(listen_at) as s, ProcessPoolExecutor(workers) as pool:
+        s.setblocking(False)
+        listen_at = links.bound(s)
+        print(f"Alice: Serving on {listen_at} with {workers} workers")
+        if config.get("rendezvous"):
+            session.publish(config["rendezvous"], listen_at)
+        sessions = set()
+        index = 0
+        try:
+            while not max_sessions or index < max_sessions:
+                conn, addr = await loop.sock_accept(s)
+                conn.setblocking(True)
+                task = asyncio.create_task(run_session(pool, conn, addr, index))
+                sessions.add(task)
+                task.add_done_callback(sessions.discard)
+                index += 1
+            await asyncio.gather(*sessions)
+        finally:
+            if config.get("rendezvous"):
+                session.withdraw(config["rendezvous"])
+    seconds = time.perf_counter() - start
+    print(f"Alice: {totals['done']}/{totals['sessions']} sessions completed, {totals['key_bits']} key bits "
+          f"in {seconds:.2f} s ({totals['key_bits'] / max(seconds, 1e-9):.0f} bits/s); keys in {store}")
 
-        # Hash it using SHA-256
-        hashed_key = hashlib.sha256(final_key_str.encode('utf-8')).digest()
-
-        # Save the hashed key to a file (Fernet expects base64)
-        fernet_key = base64.urlsafe_b64encode(hashed_key[:32])  # Fernet needs 32-byte key
+def main(argv=None):
+    # Read config (num_bits/error_bits fall back to 32/5); argv, QKD_* variables
+    # or a session descriptor override extras/qkd_config.txt for this run only
+    config = session.load(argv, defaults={"num_bits": 32, "error_bits": 5}, description="QKD Alice")
+    # Refuse a protocol the scripts cannot run before anyone connects
+    try:
+        protocols.script_bases(config.get("protocol", "bb84"))
+    except ValueError as e:
+        raise SystemExit(f"Alice: {e}")
+    rng = randomness.generator(config.get("seed"), "alice")
+    # Key material (bits, bases, samples) is drawn in bulk from os.urandom,
+    # or from a separate seeded generator when seed is set
+    key_rng = randomness.source(config.get("seed"), "alice")
+    out_dir = session.output_dir(config, os.path.dirname(os.path.abspath(__file__)))
+    key_path = os.path.join(out_dir, "final_key_alice.txt")
+    if config.get("serve", 0):
+        import asyncio
+        try:
+            asyncio.run(serve(config, out_dir))
+        except KeyboardInterrupt:
+            print("Alice: Server stopped.")
+        return
+    # checkpoint=1 journals every finished block to disk, so a dropped or
+    # restarted session resumes from the last block both sides completed
+    journal = checkpoint.open_journal(config, "alice", out_dir)
+    # link_qkd picks TCP or a Unix domain socket for the session; with TCP,
+    # port=0 takes any free port and publishes it in the rendezvous file
+    with links.listen(links.address(config, "qkd", config.get("port", PORT), HOST)) as s:
+        listen_at = links.bound(s)
+        print(f"Alice: Listening on {listen_at}")
+        if config.get("rendezvous"):
+            session.publish(config["rendezvous"], listen_at)
+        while True:
+            print("Alice: Waiting for Bob to connect...")
+            conn, addr = s.accept()
+            with conn:
+                print('Alice: Connected by', links.describe(addr))
+                try:
+                    result = run_connection(conn, config, journal, rng, key_rng, key_path)
+                except OSError as e:
+                    print(f"Alice: Connection error ({e})")
+                    result = "dropped"
+            if result != "dropped":
+                break
+            if not config.get("checkpoint", 0):
+                # Without checkpoints a broken session cannot be resumed
+                print("Aborting.")
+                open(key_path, "w").close()
+                break
+            print(f"Alice: Session interrupted after {len(journal.blocks)} blocks; waiting for Bob to resume")
+        if config.get("rendezvous"):
+            session.withdraw(config["rendezvous"])
 
-        # Write it to a file
-        key_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "final_key_alice.txt")
-        with open(key_path, "w") as f:
-            f.write("".join(final_key))
-            print("Final key saved to final_key_alice.txt")
 if __name__ == "__main__":
     main()
@@ -1,7 +1,6 @@
 import os
 import sys
 import signal
-import psutil
 import socket
 import base64
 import hashlib
@@ -10,19 +9,15 @@ import threading
 import time
 import argparse
 
-# Kill previous instance of this script (except current PID)
-current_pid = os.getpid()
-script_name = os.path.basename(__file__)
-for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-    try:
-        if proc.info['pid'] != current_pid and proc.info['cmdline'] and script_name in ' '.join(proc.info['cmdline']):
-            proc.kill()
-    except (psutil.NoSuchProcess, psutil.AccessDenied):
-        continue
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from qkd import instance, links
+from qkd.config import load_config
 
-HOST = '127.0.0.1'
-ALICE_PORT = 65433  # Alice's server port (for receiving)
-BOB_PORT = 65434   # Bob's server port (for sending)
+# link_alice / link_bob in extras/qkd_config.txt pick TCP (default, ports
+# 65433/65434) or a Unix domain socket per link
+config = load_config()
+ALICE_LINK = links.address(config, "alice")  # Alice's server (for receiving)
+BOB_LINK = links.address(config, "bob")      # Bob's server (for sending)
 
 parser = argparse.ArgumentParser()
 parser.add_argument('--mitm', action='store_true', help='Connect via MITM proxy')
@@ -43,11 +38,8 @@ def print_received(addr, msg):
     print(f"[Alice] Received: {msg}\n> ", end='', flush=True)
 
 def receive_messages():
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        s.bind((HOST, ALICE_PORT))
-        s.listen()
-        # print(f"[Alice] Listening for incoming messages on port {ALICE_PORT}...\n")
+    with links.listen(ALICE_LINK) as s:
+        # print(f"[Alice] Listening for incoming messages on {ALICE_LINK}...\n")
         while True:
             conn, addr = s.accept()
             with conn:
@@ -66,8 +58,7 @@ def send_messages():
         if msg.lower() in ("quit", "exit"): break
         encrypted = fernet.encrypt(msg.encode())
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.connect((HOST, BOB_PORT))
+            with links.connect(BOB_LINK) as s:
                 s.sendall(encrypted)
         except Exception as e:
             print(f"[Alice] Failed to send: {e}")
@@ -90,8 +81,7 @@ def receive_thread(sock, fernet):
             break
 
 def mitm_chat():
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.connect((HOST, ALICE_PORT))
+    with links.connect(ALICE_LINK) as s:
         threading.Thread(target=receive_thread, args=(s, fernet), daemon=True).start()
         while True:
             msg = input("> ")
@@ -104,6 +94,8 @@ def mitm_chat():
                 break
 
 if __name__ == "__main__":
+    # Kill previous instance of this script (the one in its pid file)
+    instance.replace_previous(os.path.basename(__file__))
     if args.mitm:
         mitm_chat()
     else:
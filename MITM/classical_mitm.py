@@ -2,22 +2,15 @@ import socket
 import threading
 import os
 import sys
-import psutil
 
-# Kill previous instance of this script (except current PID)
-current_pid = os.getpid()
-script_name = os.path.basename(__file__)
-for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-    try:
-        if proc.info['pid'] != current_pid and proc.info['cmdline'] and script_name in ' '.join(proc.info['cmdline']):
-            proc.kill()
-    except (psutil.NoSuchProcess, psutil.AccessDenied):
-        continue
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from qkd import instance, links
+from qkd.config import load_config
 
-ALICE_HOST = '127.0.0.1'
-ALICE_PORT = 65433
-BOB_HOST = '127.0.0.1'
-BOB_PORT = 65434
+# Takes the place of both classical servers, on the links configured for them
+config = load_config()
+ALICE_LINK = links.address(config, "alice")
+BOB_LINK = links.address(config, "bob")
 
 # Accept a single connection from Alice and Bob, then forward between them
 
@@ -50,22 +43,17 @@ def handle_session(alice_conn, bob_conn):
     bob_conn.close()
 
 def main():
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s_alice, \
-         socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s_bob:
-        s_alice.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        s_bob.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        s_alice.bind((ALICE_HOST, ALICE_PORT))
-        s_bob.bind((BOB_HOST, BOB_PORT))
-        s_alice.listen(5)
-        s_bob.listen(5)
+    # Kill previous instance of this script (the one in its pid file)
+    instance.replace_previous(os.path.basename(__file__))
+    with links.listen(ALICE_LINK) as s_alice, links.listen(BOB_LINK) as s_bob:
         print("MITM: Waiting for Alice and Bob to connect (multi-session mode)...")
         while True:
             print("MITM: Waiting for Alice...")
             alice_conn, alice_addr = s_alice.accept()
-            print(f"MITM: Alice connected from {alice_addr}.")
+            print(f"MITM: Alice connected from {links.describe(alice_addr)}.")
             print("MITM: Waiting for Bob...")
             bob_conn, bob_addr = s_bob.accept()
-            print(f"MITM: Bob connected from {bob_addr}.")
+            print(f"MITM: Bob connected from {links.describe(bob_addr)}.")
             threading.Thread(target=handle_session, args=(alice_conn, bob_conn), daemon=True).start()
 
 if __name__ == "__main__":
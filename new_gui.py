@@ -3,21 +3,99 @@ import os
 import random
 import base64
 import hashlib
+import numpy as np
 from PyQt5.QtWidgets import (
-    QApplication, QWidget, QLabel, QPushButton, QTextEdit, QGridLayout, QSpinBox, QScrollArea, QVBoxLayout
+    QApplication, QWidget, QLabel, QPushButton, QTextEdit, QGridLayout, QSpinBox, QVBoxLayout,
+    QCheckBox, QProgressBar
 )
 from PyQt5.QtGui import QPixmap, QPainter, QColor, QPen, QFont
-from PyQt5.QtCore import Qt, QTimer, QPointF
+from PyQt5.QtCore import Qt, QTimer, QPointF, QThread, pyqtSignal
 from cryptography.fernet import Fernet
+from qkd import kernel
+from qkd.animation import Animator
+from qkd.channel import channel_from_config
+from qkd.config import load_config
+from qkd.logview import LogView
+from qkd.trials import ABORT_THRESHOLD
+
+STEP_MAX_BITS = 256
+STEP_MAX_ERROR_BITS = 32
+TURBO_MAX_BITS = 10_000_000
+TURBO_MAX_ERROR_BITS = 100_000
+TURBO_CHUNK = 1 << 16
+TURBO_SAMPLES = 4  # qubits per chunk shown in the log
+
+class TurboRun(QThread):
+    # A whole session of num_bits qubits, computed off the GUI thread as
+    # array operations (qkd.kernel, with the channel from the config file,
+    # as in qkd.trials). After each chunk, progress carries the running
+    # totals and a few sampled qubits; result carries the outcome and, unless
+    # the session aborted, Alice's final key.
+    progress = pyqtSignal(object)
+    result = pyqtSignal(object)
+
+    def __init__(self, num_bits, error_bits, parent=None):
+        super().__init__(parent)
+        self.num_bits = num_bits
+        self.error_bits = error_bits
+
+    def run(self):
+        rng = np.random.default_rng()
+        channel = channel_from_config(load_config())
+        keys, wrongs = [], []
+        detected = sifted = errors = 0
+        for start in range(0, self.num_bits, TURBO_CHUNK):
+            if self.isInterruptionRequested():
+                return
+            n = min(TURBO_CHUNK, self.num_bits - start)
+            bits = rng.integers(2, size=n, dtype=np.int8)
+            alice_bases = rng.integers(2, size=n, dtype=np.int8)
+            bob_bases = rng.integers(2, size=n, dtype=np.int8)
+            results = kernel.measure(channel(kernel.prepare(bits, alice_bases), rng), bob_bases, rng)
+            clicked = results != kernel.NO_CLICK
+            mask = (alice_bases == bob_bases) & clicked
+            wrong = bits[mask] != results[mask]
+            keys.append(bits[mask])
+            wrongs.append(wrong)
+            detected += int(clicked.sum())
+            sifted += int(mask.sum())
+            errors += int(wrong.sum())
+            picks = np.sort(rng.choice(n, min(TURBO_SAMPLES, n), replace=False))
+            samples = [(start + int(i), int(bits[i]), kernel.BASIS_NAMES[alice_bases[i]],
+                        kernel.BASIS_NAMES[bob_bases[i]], int(results[i])) for i in picks]
+            self.progress.emit({"done": start + n, "detected": detected, "sifted": sifted,
+                                "errors": errors, "samples": samples})
+
+        summary = {"num_bits": self.num_bits, "error_bits": self.error_bits, "detected": detected,
+                   "sifted": sifted, "qber": errors / max(sifted, 1)}
+        if sifted < self.error_bits:
+            summary["abort"] = "Not enough sifted bits for error estimation."
+            self.result.emit(summary)
+            return
+        key = np.concatenate(keys)
+        sample = rng.choice(sifted, self.error_bits, replace=False)
+        summary["sample_errors"] = int(np.concatenate(wrongs)[sample].sum())
+        summary["qber_est"] = summary["sample_errors"] / max(self.error_bits, 1)
+        if summary["qber_est"] > ABORT_THRESHOLD:
+            summary["abort"] = "Error rate too high! Possible eavesdropping."
+            self.result.emit(summary)
+            return
+        final = np.delete(key, sample)
+        summary["key"] = final
+        # Same bytes as int(key, 2).to_bytes(...) in the step-by-step mode
+        padded = np.concatenate([np.zeros(-len(final) % 8, dtype=np.int8), final])
+        summary["key_bytes"] = np.packbits(padded).tobytes()
+        self.result.emit(summary)
 
 class QKDGui(QWidget):
     def __init__(self):
         super().__init__()
         self.setWindowTitle('Quantum-Assisted Cryptographic Engine')
         self.setFixedSize(1920, 1080)
+        self.turbo = None
+        self.animator = Animator(self)
         self.setup_ui()
         self.reset_qkd_state()
-        self.message_anim = None
         self.mitm_show_output = False
 
     def load_device_image(self, filename, fallback_color):
@@ -83,7 +161,7 @@ class QKDGui(QWidget):
         # Number of bits selector
         self.bits_spin = QSpinBox(self)
         self.bits_spin.setMinimum(8)
-        self.bits_spin.setMaximum(256)
+        self.bits_spin.setMaximum(STEP_MAX_BITS)
         self.bits_spin.setValue(32)
         self.bits_spin.setSingleStep(1)
         self.num_inputs_layout.addWidget(QLabel("QKD Bits:"))
@@ -92,12 +170,21 @@ class QKDGui(QWidget):
         # Number of error bits selector
         self.error_spin = QSpinBox(self)
         self.error_spin.setMinimum(1)
-        self.error_spin.setMaximum(32)
+        self.error_spin.setMaximum(STEP_MAX_ERROR_BITS)
         self.error_spin.setValue(5)
         self.error_spin.setSingleStep(1)
         self.num_inputs_layout.addWidget(QLabel("Error Check Bits:"))
         self.num_inputs_layout.addWidget(self.error_spin)
 
+        # Turbo mode: the whole session is computed in a worker thread, so
+        # much longer sessions fit; the log shows a sample of the qubits
+        self.turbo_check = QCheckBox('Turbo', self)
+        self.turbo_check.toggled.connect(self.set_turbo)
+        self.num_inputs_layout.addWidget(self.turbo_check)
+        self.turbo_progress = QProgressBar(self)
+        self.turbo_progress.hide()
+        self.num_inputs_layout.addWidget(self.turbo_progress)
+
         # Add the vertical widget to the grid layout
         self.layout.addWidget(self.num_inputs_widget, 0, 3, 2, 1)
 
@@ -117,17 +204,10 @@ class QKDGui(QWidget):
         self.layout.addWidget(self.bob_send_btn, 6, 2)
 
         # Visualization area (scrollable)
-        self.visualization = QLabel('', self)
-        self.visualization.setAlignment(Qt.AlignTop | Qt.AlignLeft)
-        self.visualization.setWordWrap(True)
-        self.visualization.setMinimumHeight(120)
+        self.visualization = LogView(self)
         self.visualization.setFont(QFont('Arial', 12))
-
-        self.scroll_area = QScrollArea(self)
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setWidget(self.visualization)
-        self.scroll_area.setFixedHeight(200)
-        self.layout.addWidget(self.scroll_area, 7, 0, 1, 5)
+        self.visualization.setFixedHeight(200)
+        self.layout.addWidget(self.visualization, 7, 0, 1, 5)
 
         # MITM Button and label (centered between classical devices)
         self.mitm_widget = QWidget(self)
@@ -167,14 +247,21 @@ class QKDGui(QWidget):
         self.key_label.setText('QKD Key: (not generated)')
         self.visualization.setText('')
         self.qkd_button.setEnabled(True)
-        self.message_anim = None
         self.fernet = None
 
+    def set_turbo(self, on):
+        self.bits_spin.setMaximum(TURBO_MAX_BITS if on else STEP_MAX_BITS)
+        self.error_spin.setMaximum(TURBO_MAX_ERROR_BITS if on else STEP_MAX_ERROR_BITS)
+        self.turbo_progress.setVisible(on)
+
     def start_qkd_animation(self):
         num_bits = self.bits_spin.value()
         error_bits = self.error_spin.value()
         self.reset_qkd_state()
         self.qkd_button.setEnabled(False)
+        if self.turbo_check.isChecked():
+            self.start_turbo(num_bits, error_bits)
+            return
         self.visualization.setText('Generating random bits and bases...')
         self.qkd_bits = [random.randint(0, 1) for _ in range(num_bits)]
         self.qkd_bases_alice = [random.choice(['Z', 'X']) for _ in range(num_bits)]
@@ -193,14 +280,54 @@ class QKDGui(QWidget):
         self.qkd_timer.timeout.connect(self.qkd_animate_step)
         self.qkd_timer.start(500)
 
-    def append_visualization(self, text):
-        current = self.visualization.text()
-        self.visualization.setText(current + ("\n" if current else "") + text)
-        self.visualization.repaint()
-        QTimer.singleShot(0, self.scroll_to_bottom)
+    def start_turbo(self, num_bits, error_bits):
+        self.visualization.setText(f'Turbo: simulating {num_bits} qubits in the background. '
+                                   f'The log shows {TURBO_SAMPLES} sampled qubits per {TURBO_CHUNK}.')
+        self.turbo_progress.setRange(0, num_bits)
+        self.turbo_progress.setValue(0)
+        self.turbo = TurboRun(num_bits, error_bits, self)
+        self.turbo.progress.connect(self.turbo_step)
+        self.turbo.result.connect(self.turbo_finished)
+        self.turbo.start()
+
+    def turbo_step(self, stats):
+        self.turbo_progress.setValue(stats['done'])
+        for index, bit, alice_basis, bob_basis, measured in stats['samples']:
+            outcome = "no click" if measured == kernel.NO_CLICK else f"measures {measured}"
+            self.append_visualization(f"Qubit {index}: Alice sends {bit} in {alice_basis}, Bob {outcome} in {bob_basis}")
+        qber = stats['errors'] / max(stats['sifted'], 1)
+        self.key_label.setText(f"Sifted {stats['sifted']} of {stats['done']} qubits, QBER {qber:.3f}")
+
+    def turbo_finished(self, summary):
+        self.qkd_button.setEnabled(True)
+        self.append_visualization(
+            f"{summary['num_bits']} qubits: {summary['detected']} detected, {summary['sifted']} sifted, "
+            f"true error rate {summary['qber']:.4f}")
+        if 'qber_est' in summary:
+            self.append_visualization(
+                f"Errors in sample: {summary['sample_errors']}/{summary['error_bits']}, "
+                f"Error rate: {summary['qber_est']:.4f}")
+        if 'abort' in summary:
+            self.append_visualization(f"{summary['abort']} Aborting.")
+            self.key_label.setText('QKD Key: (not generated)')
+            return
+        key = summary['key']
+        preview = ''.join(map(str, key[:64].tolist()))
+        self.key_label.setText(f"QKD Key: {preview}{'...' if len(key) > 64 else ''} ({len(key)} bits)")
+        self.append_visualization(f"Final key: {len(key)} bits after removing sample bits.")
+        self.append_visualization("Hashing the key with SHA-256 and saving for encryption.")
+        self.fernet = Fernet(base64.urlsafe_b64encode(hashlib.sha256(summary['key_bytes']).digest()))
+        self.animate_key_transmission()
+
+    def closeEvent(self, event):
+        if self.turbo and self.turbo.isRunning():
+            self.turbo.requestInterruption()
+            self.turbo.wait()
+        event.accept()
 
-    def scroll_to_bottom(self):
-        self.scroll_area.verticalScrollBar().setValue(self.scroll_area.verticalScrollBar().maximum())
+    def append_visualization(self, text):
+        # Queued; the log view inserts and scrolls once per frame
+        self.visualization.append(text)
 
     def qkd_animate_step(self):
         if self.qkd_step < len(self.qkd_bits):
@@ -217,7 +344,6 @@ class QKDGui(QWidget):
                 self.append_visualization(f"Bob measures in wrong basis, gets random bit: {measured}")
             self.qkd_bob_results.append(measured)
             self.qkd_step += 1
-            self.update()
             return
 
         if self.qkd_step == len(self.qkd_bits):
@@ -227,7 +353,6 @@ class QKDGui(QWidget):
             self.append_visualization(f"Sifted key indices: {self.qkd_sifted_indices}")
             self.append_visualization(f"Sifted key: {''.join(map(str, self.qkd_sifted_key))}")
             self.qkd_step += 1
-            self.update()
             return
 
         if self.qkd_step == len(self.qkd_bits) + 1:
@@ -249,7 +374,6 @@ class QKDGui(QWidget):
                 f"Errors: {errors}/{self.qkd_error_bits}, Error rate: {self.qkd_error_rate:.2f}"
             )
             self.qkd_step += 1
-            self.update()
             return
 
         if self.qkd_step == len(self.qkd_bits) + 2:
@@ -274,26 +398,11 @@ class QKDGui(QWidget):
     def animate_key_transmission(self):
         start = self.get_device_center(self.qkd_alice)
         end = self.get_device_center(self.qkd_bob)
-        self.key_anim = {'start': start, 'end': end, 'pos': start, 'step': 0}
-        self.key_timer = QTimer(self)
-        self.key_timer.timeout.connect(self.update_key_anim)
-        self.key_timer.start(30)
+        self.animator.add(start, end, self.key_transmitted)
         self.append_visualization("Transmitting the final key from QKD Alice to QKD Bob...")
 
-    def update_key_anim(self):
-        anim = self.key_anim
-        if anim['step'] >= 30:
-            self.key_timer.stop()
-            self.key_anim = None
-            self.append_visualization("Key successfully shared between QKD Alice and QKD Bob!")
-            self.visualization.repaint()
-            return
-        t = anim['step'] / 30
-        x = anim['start'].x() + (anim['end'].x() - anim['start'].x()) * t
-        y = anim['start'].y() + (anim['end'].y() - anim['start'].y()) * t
-        anim['pos'] = QPointF(x, y)
-        anim['step'] += 1
-        self.update()
+    def key_transmitted(self):
+        self.append_visualization("Key successfully shared between QKD Alice and QKD Bob!")
 
     def get_device_center(self, widget):
         pos = widget.mapTo(self, widget.rect().center())
@@ -312,47 +421,26 @@ class QKDGui(QWidget):
         painter.drawLine(p3, p4)
         painter.drawLine(p1, p3)
         painter.drawLine(p2, p4)
-        if self.message_anim:
-            painter.setBrush(QColor(0, 200, 0))
-            painter.setPen(Qt.NoPen)
-            painter.drawEllipse(self.message_anim['pos'], 18, 18)
-        if hasattr(self, 'key_anim') and self.key_anim:
-            painter.setBrush(QColor(0, 200, 0))
-            painter.setPen(Qt.NoPen)
-            painter.drawEllipse(self.key_anim['pos'], 18, 18)
+        self.animator.paint(painter)
 
     def animate_message(self, from_widget, to_widget, text, receiver_box, mitm=False):
+        # Any number of messages can be in flight; each is delivered on arrival
         start = self.get_device_center(from_widget)
         end = self.get_device_center(to_widget)
-        self.message_anim = {'start': start, 'end': end, 'pos': start, 'step': 0, 'text': text, 'receiver_box': receiver_box, 'mitm': mitm}
-        self.msg_timer = QTimer(self)
-        self.msg_timer.timeout.connect(self.update_message_anim)
-        self.msg_timer.start(30)
-
-    def update_message_anim(self):
-        anim = self.message_anim
-        if anim['step'] >= 30:
-            self.msg_timer.stop()
-            self.message_anim = None
-            # Encrypt the message
-            encrypted = self.fernet.encrypt(anim['text'].encode())
-            # MITM interception: show encrypted message if MITM is active
-            if anim['mitm'] and self.mitm_show_output:
-                self.mitm_encrypted_label.setText(f"MITM intercepted (encrypted):\n{encrypted.decode()}")
-            else:
-                self.mitm_encrypted_label.setText("")
-            # Decrypt and display
-            decrypted = self.fernet.decrypt(encrypted).decode()
-            anim['receiver_box'].setText(f"Decrypted: {decrypted}")
-            self.visualization.setText(f"Message delivered: {decrypted}")
-            self.update()
-            return
-        t = anim['step'] / 30
-        x = anim['start'].x() + (anim['end'].x() - anim['start'].x()) * t
-        y = anim['start'].y() + (anim['end'].y() - anim['start'].y()) * t
-        anim['pos'] = QPointF(x, y)
-        anim['step'] += 1
-        self.update()
+        self.animator.add(start, end, lambda: self.deliver_message(text, receiver_box, mitm))
+
+    def deliver_message(self, text, receiver_box, mitm):
+        # Encrypt the message
+        encrypted = self.fernet.encrypt(text.encode())
+        # MITM interception: show encrypted message if MITM is active
+        if mitm and self.mitm_show_output:
+            self.mitm_encrypted_label.setText(f"MITM intercepted (encrypted):\n{encrypted.decode()}")
+        else:
+            self.mitm_encrypted_label.setText("")
+        # Decrypt and display
+        decrypted = self.fernet.decrypt(encrypted).decode()
+        receiver_box.setText(f"Decrypted: {decrypted}")
+        self.append_visualization(f"Message delivered: {decrypted}")
 
     def send_from_alice(self):
         msg = self.alice_msg_box.toPlainText()
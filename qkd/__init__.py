@@ -0,0 +1 @@
+# Shared simulation code used by the Alice/Bob scripts, the GUIs and test-cirq.py.
@@ -0,0 +1,97 @@
+import collections
+import time
+
+from PyQt5.QtCore import QObject, QPointF, QRectF, Qt, QTimer
+from PyQt5.QtGui import QColor
+
+from qkd.logview import FRAME_MS
+
+# Moving dots for the GUIs' key and message transfers.
+#
+# Each transfer used to get its own 30 ms QTimer and repaint the whole
+# window every step. A message sent while another was moving replaced it,
+# so the first one never arrived. An Animator owns a single frame timer
+# for all transfers in flight, and the timer only runs while something is
+# moving. Positions come from the time elapsed since a transfer started,
+# not from a step count, so a slow frame does not slow the transfers
+# down. Each frame repaints only the rectangles a dot left and entered.
+# Qt merges those into one paint, however many transfers there are. At
+# most MAX_IN_FLIGHT transfers move at once; later ones wait in a queue
+# and start as slots free up. on_done runs when a transfer arrives.
+# Only the GUIs import this module, since it needs PyQt5.
+
+DURATION = 0.9  # seconds per transfer, as the old 30 steps of 30 ms
+RADIUS = 18
+MAX_IN_FLIGHT = 32
+GREEN = QColor(0, 200, 0)
+
+
+class Transfer:
+    def __init__(self, start, end, on_done, duration, color):
+        self.start = start
+        self.end = end
+        self.on_done = on_done
+        self.duration = duration
+        self.color = color
+        self.pos = start
+        self.began = None
+
+    def rect(self):
+        # Area the dot covers, with a pixel to spare for rounding
+        size = RADIUS + 1
+        return QRectF(self.pos.x() - size, self.pos.y() - size, 2 * size, 2 * size).toAlignedRect()
+
+
+class Animator(QObject):
+    def __init__(self, widget):
+        super().__init__(widget)
+        self.widget = widget
+        self.moving = []
+        self.waiting = collections.deque()
+        self.timer = QTimer(self)
+        self.timer.setInterval(FRAME_MS)
+        self.timer.timeout.connect(self.tick)
+
+    def add(self, start, end, on_done=None, duration=DURATION, color=GREEN):
+        # Move a dot from `start` to `end` (QPointF, widget coordinates)
+        self.waiting.append(Transfer(start, end, on_done, duration, color))
+        self._admit()
+
+    def _admit(self):
+        now = time.monotonic()
+        while self.waiting and len(self.moving) < MAX_IN_FLIGHT:
+            transfer = self.waiting.popleft()
+            transfer.began = now
+            self.moving.append(transfer)
+            self.widget.update(transfer.rect())
+        if self.moving and not self.timer.isActive():
+            self.timer.start()
+
+    def tick(self):
+        now = time.monotonic()
+        arrived = []
+        for transfer in list(self.moving):
+            old = transfer.rect()
+            t = min((now - transfer.began) / transfer.duration, 1.0)
+            transfer.pos = QPointF(transfer.start.x() + (transfer.end.x() - transfer.start.x()) * t,
+                                   transfer.start.y() + (transfer.end.y() - transfer.start.y()) * t)
+            if t >= 1.0:
+                self.moving.remove(transfer)
+                arrived.append(transfer)
+                self.widget.update(old)
+            else:
+                self.widget.update(old.united(transfer.rect()))
+        self._admit()
+        if not self.moving:
+            self.timer.stop()
+        for transfer in arrived:
+            if transfer.on_done:
+                transfer.on_done()
+
+    def paint(self, painter):
+        # Call from the widget's paintEvent; the painter is already clipped
+        # to the dirty region
+        painter.setPen(Qt.NoPen)
+        for transfer in self.moving:
+            painter.setBrush(transfer.color)
+            painter.drawEllipse(transfer.pos, RADIUS, RADIUS)
@@ -0,0 +1,186 @@
+import argparse
+import os
+import secrets
+
+import numpy as np
+
+# Wegman-Carter authentication for the classical QKD channel.
+#
+# Every classical message (bases, decoy classes, samples, KEEP/DONE...) gets
+# a tag: a polynomial universal hash of the message, one-time-padded with
+# fresh key from the pool. The hash runs in LANES independent fields
+# GF(2^31 - 1), so evaluating it is a handful of NumPy operations over the
+# whole message (powers of the key are built by doubling and cached). The
+# message's 24-bit words and then its byte length are the coefficients of
+# m_1 r + m_2 r^2 + ... + len r^(L+1). Every coefficient is multiplied by a
+# power of the key, and the length makes the top coefficient non-zero, so
+# two different messages (also ones that differ only by trailing NULs)
+# collide in a lane with probability at most (L + 1) / 2^31. A forgery
+# succeeds with probability about ((L + 1) / 2^31)^LANES for an L-word message.
+#
+# Key layout of a session, taken from the front of the shared pool:
+#   [hash key A->B][hash key B->A][pad 0 A->B][pad 0 B->A][pad 1 A->B]...
+# Hash keys are reused for the whole session; pads are never reused. A
+# session takes `budget` bits out of the pool file when it opens, before the
+# first tag, so a session that never closes (crash, kill, dropped peer) has
+# burnt its reservation and the next one starts on fresh pads. A clean close
+# puts the unused end back at the front of the pool; an abort keeps it burnt.
+
+P = (1 << 31) - 1
+LANES = 4
+LANE_BITS = 31
+TAG_BITS = LANES * LANE_BITS
+WORD_BYTES = 3  # 24-bit message words, below P
+DEFAULT_BUDGET = 32768
+ALICE_TO_BOB = 0
+BOB_TO_ALICE = 1
+
+
+class AuthenticationError(Exception):
+    pass
+
+
+class KeyPool:
+    # Pre-shared key material, one '0'/'1' string per file (same format as
+    # the final key files)
+    def __init__(self, path):
+        self.path = path
+        with open(path) as f:
+            self.bits = f.read().strip()
+
+    def __len__(self):
+        return len(self.bits)
+
+    def take(self, count):
+        # Remove the first `count` bits from the pool (and the file) and return them
+        if count > len(self.bits):
+            raise AuthenticationError(f"key pool {self.path} has {len(self.bits)} bits, {count} needed")
+        taken, self.bits = self.bits[:count], self.bits[count:]
+        self._save()
+        return taken
+
+    def refund(self, bits):
+        # Unused bits of a reservation go back where they were taken from
+        self.bits = bits + self.bits
+        self._save()
+
+    def add(self, bits):
+        self.bits += bits
+        self._save()
+
+    def _save(self):
+        with open(self.path, "w") as f:
+            f.write(self.bits)
+
+
+def _lanes(bits):
+    # TAG_BITS key bits -> LANES field elements
+    return np.array([int(bits[i:i + LANE_BITS], 2) % P for i in range(0, TAG_BITS, LANE_BITS)], dtype=np.uint64)
+
+
+def _words(message):
+    # Message words, then the length, so messages that only differ by zero
+    # padding hash differently
+    data = message + b'\0' * (-len(message) % WORD_BYTES)
+    chunks = np.frombuffer(data, dtype=np.uint8).reshape(-1, WORD_BYTES).astype(np.uint64)
+    words = (chunks[:, 0] << np.uint64(16)) | (chunks[:, 1] << np.uint64(8)) | chunks[:, 2]
+    return np.concatenate([words, np.array([len(message) % P], dtype=np.uint64)])
+
+
+class PolyHash:
+    def __init__(self, key_bits):
+        self.r = _lanes(key_bits)
+        self.powers = np.ones((LANES, 1), dtype=np.uint64)
+
+    def _powers(self, count):
+        # r^0 .. r^(count - 1) per lane, doubling the cached table as needed
+        while self.powers.shape[1] < count:
+            step = self.powers[:, -1:] * self.r[:, None] % P
+            self.powers = np.concatenate([self.powers, self.powers * step % P], axis=1)
+        return self.powers[:, :count]
+
+    def __call__(self, message):
+        # sum of words[i] * r^(i + 1): no coefficient enters the tag without the key
+        words = _words(message)
+        terms = words[None, :] * self._powers(len(words) + 1)[:, 1:] % P
+        return terms.sum(axis=1) % P
+
+
+class AuthSession:
+    def __init__(self, pool, role, budget=DEFAULT_BUDGET):
+        self.pool = pool
+        self.budget = min(budget, len(pool))
+        self.key = pool.take(self.budget)
+        self.outgoing = ALICE_TO_BOB if role == "alice" else BOB_TO_ALICE
+        self.hashes = [PolyHash(self.key[:TAG_BITS]), PolyHash(self.key[TAG_BITS:2 * TAG_BITS])]
+        self.sent = 0
+        self.received = 0
+
+    def _pad(self, direction, seq):
+        start = 2 * TAG_BITS + (2 * seq + direction) * TAG_BITS
+        if start + TAG_BITS > self.budget:
+            raise AuthenticationError(f"authentication budget of {self.budget} bits exhausted")
+        return _lanes(self.key[start:start + TAG_BITS])
+
+    def _tag(self, direction, seq, message):
+        tag = (self.hashes[direction](message) + self._pad(direction, seq)) % P
+        return ''.join(f"{int(t):08x}" for t in tag)
+
+    def sign(self, line):
+        # "MESSAGE\n" -> "MESSAGE#tag\n"
+        message = line.rstrip('\n')
+        tag = self._tag(self.outgoing, self.sent, message.encode('utf-8'))
+        self.sent += 1
+        return f"{message}#{tag}\n"
+
+    def verify(self, line):
+        # Inverse of sign(); raises AuthenticationError on a missing or forged tag
+        message, _, tag = line.rstrip('\n').rpartition('#')
+        expected = self._tag(1 - self.outgoing, self.received, message.encode('utf-8'))
+        self.received += 1
+        if not secrets.compare_digest(tag, expected):
+            raise AuthenticationError(f"bad tag on message {self.received - 1}")
+        return message + '\n'
+
+    def used_bits(self):
+        # Hash keys plus every pad slot up to the last message in either direction
+        return 2 * TAG_BITS + 2 * max(self.sent, self.received) * TAG_BITS
+
+    def close(self, success):
+        used = min(self.used_bits(), self.budget) if success else self.budget
+        if used < self.budget:
+            self.pool.refund(self.key[used:])
+        messages = self.sent + self.received
+        return (f"Authentication: {messages} messages, {used} key bits consumed "
+                f"({used / max(messages, 1):.0f} per message), {len(self.pool)} left in the pool")
+
+
+def default_pool_path(script_dir):
+    return os.path.join(script_dir, "auth_pool.txt")
+
+
+def open_session(config, role, script_dir):
+    # None unless auth=1 in the config
+    if not config.get("auth", 0):
+        return None
+    pool = KeyPool(config.get(f"auth_pool_{role}", default_pool_path(script_dir)))
+    return AuthSession(pool, role, config.get("auth_budget", DEFAULT_BUDGET))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Provision the pre-shared authentication key pools")
+    parser.add_argument('--provision', type=int, default=1_000_000, help="pool size in bits")
+    args = parser.parse_args()
+
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    raw = np.unpackbits(np.frombuffer(secrets.token_bytes((args.provision + 7) // 8), dtype=np.uint8))
+    bits = (raw[:args.provision] + ord('0')).tobytes().decode()
+    for side in ("Alice", "Bob"):
+        path = default_pool_path(os.path.join(root, side))
+        with open(path, "w") as f:
+            f.write(bits)
+        print(f"Wrote {len(bits)} bits to {os.path.normpath(path)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+import numpy as np
+
+from qkd import kernel
+
+# Channel models applied to a whole QubitBatch at once.
+#
+# Each stage is a callable stage(batch, rng) -> batch, so stages compose in
+# any order with Channel(...). Noise is sampled per qubit (a trajectory per
+# qubit), which keeps every state a pure Bloch vector except where a dark
+# count replaces it with the maximally mixed state.
+
+
+class Depolarizing:
+    # With probability p apply a uniformly random X, Y or Z (QBER = 2p/3)
+    def __init__(self, p):
+        self.p = p
+
+    def __call__(self, batch, rng):
+        if self.p <= 0:
+            return batch
+        n = len(batch)
+        hit = rng.random(n) < self.p
+        paulis = np.where(hit, rng.integers(1, 4, size=n), 0)
+        return kernel.apply_paulis(batch, paulis)
+
+
+class BitFlip:
+    def __init__(self, p):
+        self.p = p
+
+    def __call__(self, batch, rng):
+        if self.p <= 0:
+            return batch
+        paulis = np.where(rng.random(len(batch)) < self.p, 1, 0)
+        return kernel.apply_paulis(batch, paulis)
+
+
+class PhaseFlip:
+    def __init__(self, p):
+        self.p = p
+
+    def __call__(self, batch, rng):
+        if self.p <= 0:
+            return batch
+        paulis = np.where(rng.random(len(batch)) < self.p, 3, 0)
+        return kernel.apply_paulis(batch, paulis)
+
+
+class PhotonLoss:
+    # Fibre transmittance and detector efficiency drop photons; a dark count
+    # on an empty slot produces a click with a random outcome.
+    def __init__(self, transmittance=1.0, detector_efficiency=1.0, dark_count=0.0):
+        self.transmittance = transmittance
+        self.detector_efficiency = detector_efficiency
+        self.dark_count = dark_count
+
+    def __call__(self, batch, rng):
+        n = len(batch)
+        eta = self.transmittance * self.detector_efficiency
+        if eta < 1.0:
+            batch.detected = batch.detected & (rng.random(n) < eta)
+        if self.dark_count > 0:
+            dark = ~batch.detected & (rng.random(n) < self.dark_count)
+            batch.bloch[dark] = 0.0
+            batch.detected = batch.detected | dark
+        return batch
+
+
+class InterceptResend:
+    # Eve measures a fraction of the qubits in a random basis and resends
+    # the state she observed.
+    def __init__(self, fraction, bases=(kernel.Z, kernel.X)):
+        self.fraction = fraction
+        self.bases = np.asarray(bases)
+
+    def __call__(self, batch, rng):
+        if self.fraction <= 0:
+            return batch
+        n = len(batch)
+        hit = np.flatnonzero(rng.random(n) < self.fraction)
+        if len(hit) == 0:
+            return batch
+        eve_bases = self.bases[rng.integers(len(self.bases), size=len(hit))]
+        axes = kernel.BASIS_AXES[eve_bases]
+        sub = kernel.QubitBatch(batch.bloch[hit])
+        eve_bits = kernel.measure_on_axes(sub, axes, rng)
+        batch.bloch[hit] = axes * (1.0 - 2.0 * eve_bits)[:, None]
+        return batch
+
+
+class Channel:
+    def __init__(self, *stages):
+        self.stages = list(stages)
+
+    def __call__(self, batch, rng):
+        for stage in self.stages:
+            batch = stage(batch, rng)
+        return batch
+
+
+def channel_from_config(config, include_loss=True):
+    # Build the channel described by the qkd_config.txt keys; stages that are
+    # not configured are left out entirely. The decoy engine models loss per
+    # photon itself and asks for the noise stages only.
+    stages = []
+    if config.get('eve_fraction', 0) > 0:
+        stages.append(InterceptResend(config['eve_fraction']))
+    if config.get('depolarizing', 0) > 0:
+        stages.append(Depolarizing(config['depolarizing']))
+    if config.get('bit_flip', 0) > 0:
+        stages.append(BitFlip(config['bit_flip']))
+    if config.get('phase_flip', 0) > 0:
+        stages.append(PhaseFlip(config['phase_flip']))
+    loss = PhotonLoss(
+        config.get('transmittance', 1.0),
+        config.get('detector_efficiency', 1.0),
+        config.get('dark_count', 0.0),
+    )
+    if include_loss and (loss.transmittance * loss.detector_efficiency < 1.0 or loss.dark_count > 0):
+        stages.append(loss)
+    return Channel(*stages)
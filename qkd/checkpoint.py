@@ -0,0 +1,126 @@
+import json
+import os
+import secrets
+
+import numpy as np
+
+# Block-boundary checkpoints for long alice.py/bob.py sessions.
+#
+# Each side keeps an append-only JSON-lines journal: a header with the
+# session id and the generator state it started from, then one line per
+# finished block (its key bits packed as hex, the error sample and the
+# generator state after it). Appending keeps a
+# checkpoint O(block) however long the run is. When a peer reconnects both
+# sides roll back to the number of blocks they have both finished, which
+# only ever differs by the KEEP messages that were in flight, and restore
+# the generator states saved with the last block they keep. With
+# pipeline_depth=1 a seeded session then redraws the rolled-back blocks
+# exactly; deeper pipelines interleave the draws of blocks in flight, so
+# the redrawn blocks agree between the sides but differ from an unbroken run.
+#
+# Without a path the journal only lives in memory (nothing survives a
+# restart, but the session code is the same).
+
+
+def pack_bits(bits):
+    if not bits:
+        return ''
+    return np.packbits(np.frombuffer(bits.encode(), dtype=np.uint8) - ord('0')).tobytes().hex()
+
+
+def unpack_bits(packed, length):
+    if not length:
+        return ''
+    raw = np.unpackbits(np.frombuffer(bytes.fromhex(packed), dtype=np.uint8))[:length]
+    return (raw + ord('0')).tobytes().decode()
+
+
+def new_session_id():
+    return secrets.token_hex(8)
+
+
+class Journal:
+    def __init__(self, path=None):
+        self.path = path
+        self.session = None
+        self.blocks = []
+        self.start_rng = None
+        self.rng_state = None
+        if path and os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        with open(self.path) as f:
+            for line in f:
+                record = json.loads(line)
+                if 'session' in record:
+                    self.session = record['session']
+                    self.start_rng = record.get('rng')
+                    self.rng_state = self.start_rng
+                if 'block' in record:
+                    entry = record['block']
+                    entry['bits'] = unpack_bits(entry.pop('packed'), entry['length'])
+                    entry['rng'] = record.get('rng')
+                    self.blocks.append(entry)
+                    self.rng_state = entry['rng']
+
+    def _append(self, record):
+        if not self.path:
+            return
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _block_record(self, entry):
+        entry = dict(entry, packed=pack_bits(entry['bits']), length=len(entry['bits']))
+        del entry['bits']
+        return {'block': entry, 'rng': entry.pop('rng')}
+
+    def _rewrite(self):
+        if not self.path:
+            return
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(json.dumps({'session': self.session, 'rng': self.start_rng}) + '\n')
+            for entry in self.blocks:
+                f.write(json.dumps(self._block_record(entry)) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def start(self, session, rng_state=None):
+        self.session = session
+        self.blocks = []
+        self.start_rng = self.rng_state = rng_state
+        self._rewrite()
+
+    def key(self):
+        return ''.join(entry['bits'] for entry in self.blocks)
+
+    def add_block(self, entry, rng_state=None):
+        # entry: {'id', 'n', 'bits', ...}; called once per KEEP, in the same order on both sides
+        entry = dict(entry, rng=rng_state)
+        self.blocks.append(entry)
+        self.rng_state = rng_state
+        self._append(self._block_record(entry))
+
+    def rollback(self, count):
+        if count < len(self.blocks):
+            self.blocks = self.blocks[:count]
+            self.rng_state = self.blocks[-1]['rng'] if self.blocks else self.start_rng
+            self._rewrite()
+
+    def clear(self):
+        self.session = None
+        self.blocks = []
+        self.start_rng = self.rng_state = None
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def open_journal(config, role, script_dir):
+    # checkpoint=1 persists the journal next to the script
+    if not config.get("checkpoint", 0):
+        return Journal()
+    return Journal(config.get(f"checkpoint_path_{role}", os.path.join(script_dir, "session_checkpoint.jsonl")))
@@ -0,0 +1,27 @@
+import os
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../extras/qkd_config.txt")
+
+
+def parse_value(value):
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def load_config(path=DEFAULT_CONFIG_PATH, defaults=None):
+    # key=value lines, '#' comments; a missing or unreadable file keeps the defaults
+    config = dict(defaults or {})
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith("#") or not line.strip() or "=" not in line:
+                    continue
+                key, value = line.strip().split("=", 1)
+                config[key.strip()] = parse_value(value.strip())
+    except Exception:
+        pass
+    return config
@@ -0,0 +1,700 @@
+import argparse
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from qkd import auth, checkpoint, decoy, finite, kernel, monitor, protocols, randomness, sizing
+from qkd.channel import channel_from_config
+from qkd.config import load_config
+
+# The QKD session protocol as importable role objects.
+#
+# Alice and Bob each run one side of a session over a Transport: anything
+# that can send text messages and read them back line by line. alice.py and
+# bob.py drive them over TCP sockets; loopback() connects the two roles
+# inside one process, so a complete session (the same messages, the same
+# sifting, sampling and authentication) runs without spawning scripts or
+# opening sockets:
+#
+#     result, alice_key, bob_key = engine.generate_key(config)
+#
+# Roles print what the scripts print; pass log=None for a silent run.
+
+
+class Transport:
+    def send(self, message):
+        # Queue one or more '\n'-terminated lines for the peer
+        raise NotImplementedError
+
+    def readline(self):
+        # Next line from the peer, '' once the peer has gone
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SocketTransport(Transport):
+    # A connected socket. Sends go through a writer thread, so a role can
+    # queue the next block while the earlier ones are still on the wire.
+    def __init__(self, sock):
+        self.sock = sock
+        self.reader = sock.makefile('r', encoding='utf-8')
+        self.outbox = queue.Queue()
+        self.writer = threading.Thread(target=self._send_loop, daemon=True)
+        self.writer.start()
+
+    def _send_loop(self):
+        while True:
+            message = self.outbox.get()
+            if message is None:
+                return
+            try:
+                self.sock.sendall(message.encode('utf-8'))
+            except OSError:
+                return
+
+    def send(self, message):
+        self.outbox.put(message)
+
+    def readline(self):
+        return self.reader.readline()
+
+    def close(self):
+        # Flush what is queued; the socket itself belongs to the caller
+        if self.writer.is_alive():
+            self.outbox.put(None)
+            self.writer.join()
+
+
+class LoopbackTransport(Transport):
+    # One end of an in-memory pipe; see loopback()
+    def __init__(self, inbox, outbox):
+        self.inbox = inbox
+        self.outbox = outbox
+        self.lines = []
+        self.pos = 0
+        self.closed = False
+
+    def send(self, message):
+        self.outbox.put(message)
+
+    def readline(self):
+        while self.pos == len(self.lines):
+            message = self.inbox.get()
+            if message is None:
+                self.inbox.put(None)  # stay at end of stream
+                return ''
+            self.lines = message.splitlines(keepends=True)
+            self.pos = 0
+        line = self.lines[self.pos]
+        self.pos += 1
+        return line
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.outbox.put(None)
+
+
+def loopback():
+    # (alice_end, bob_end) of an in-memory connection
+    alice_to_bob, bob_to_alice = queue.Queue(), queue.Queue()
+    return LoopbackTransport(bob_to_alice, alice_to_bob), LoopbackTransport(alice_to_bob, bob_to_alice)
+
+
+class KeyFile:
+    # The key as it grows block by block, written through to `path` if there is one
+    def __init__(self, path=None, bits=''):
+        self.bits = list(bits)
+        self.file = open(path, "w") if path else None
+        self._write(bits)
+
+    def _write(self, bits):
+        if self.file:
+            self.file.write(bits)
+            self.file.flush()
+
+    def extend(self, bits):
+        self.bits += bits
+        self._write(''.join(bits))
+
+    def truncate(self, length):
+        del self.bits[length:]
+        if self.file:
+            self.file.truncate(length)
+            self.file.seek(length)
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+
+def _silent(*args):
+    pass
+
+
+def measure_bits(bits, alice_bases, bob_bases, channel, rng):
+    # Prepare the whole batch, pass it through the channel (noise, loss, Eve)
+    # and measure every qubit in Bob's basis. Undetected qubits come back as
+    # kernel.NO_CLICK.
+    batch = kernel.prepare(bits, kernel.basis_index(alice_bases))
+    batch = channel(batch, rng)
+    return kernel.measure(batch, kernel.basis_index(bob_bases), rng)
+
+
+def measure_pulses(bits, alice_bases, bob_bases, photons, config, rng):
+    # Decoy mode: loss acts per photon, so detection is decided from the photon
+    # numbers first and only the pulses that click go through the noise channel.
+    eta = config.get("transmittance", 1.0) * config.get("detector_efficiency", 1.0)
+    clicked, dark_only = decoy.detect(np.asarray(photons), eta, config.get("dark_count", 0.0), rng)
+    idx = np.flatnonzero(clicked)
+    results = np.full(len(bits), kernel.NO_CLICK, dtype=np.int8)
+    batch = kernel.prepare(np.asarray(bits)[idx], kernel.basis_index(alice_bases)[idx])
+    batch = channel_from_config(config, include_loss=False)(batch, rng)
+    batch.bloch[dark_only[idx]] = 0.0
+    results[idx] = kernel.measure(batch, kernel.basis_index(bob_bases)[idx], rng)
+    return results
+
+
+class Role:
+    def __init__(self, config, rng=None, key_rng=None, journal=None, script_dir=None, log=print):
+        # rng drives the physical simulation, key_rng the key material (bits,
+        # bases, samples: os.urandom unless seeded). The journal carries
+        # finished blocks across reconnects; script_dir is where auth=1 looks
+        # for auth_pool.txt.
+        self.config = config
+        self.rng = rng if rng is not None else randomness.generator(config.get("seed"), self.role)
+        self.key_rng = key_rng if key_rng is not None else randomness.source(config.get("seed"), self.role)
+        self.journal = journal if journal is not None else checkpoint.Journal()
+        self.script_dir = script_dir or os.getcwd()
+        self.verbose = log is not None
+        self.log = log or _silent
+        self.protocol = config.get("protocol", "bb84")
+        # six_state adds the Y basis; bb84 and decoy use Z/X
+        self.bases = np.asarray(protocols.script_bases(self.protocol))
+        self.key = ''
+
+    def random_state(self):
+        # Both generators' positions, journaled with every finished block so
+        # a resumed seeded session draws what an unbroken one would have
+        return {"sim": self.rng.bit_generator.state, "key": self.key_rng.state()}
+
+    def restore_random(self, state):
+        if state is not None:
+            self.rng.bit_generator.state = state["sim"]
+            self.key_rng.restore(state["key"])
+
+
+class Alice(Role):
+    role = "alice"
+
+    def new_block(self, k, n):
+        # Generate block k; Bob's replies fill in the rest of the dict as the
+        # block moves through sifting and error estimation. Bits and bases come
+        # from key_rng, the photon source from rng.
+        block = {"id": k, "n": n}
+        block["bits"] = self.key_rng.bits(n).tolist()
+        block["bases"] = kernel.basis_names(self.bases[self.key_rng.integers(len(self.bases), n)])
+        if self.protocol == "decoy":
+            # Weak coherent source: every pulse gets an intensity class and a Poisson photon number
+            block["source"] = decoy.source_from_config(self.config)
+            block["classes"], block["photons"] = block["source"].sample(n, self.rng)
+
+        lines = [f"BLOCK:{k}:{n}\n"]
+        for i, (bit, basis) in enumerate(zip(block["bits"], block["bases"])):
+            # Basis and bit, plus the photon number for decoy pulses
+            if self.protocol == "decoy":
+                lines.append(f"{basis}|{bit}|{block['photons'][i]}\n")
+            else:
+                lines.append(f"{basis}|{bit}\n")
+        block["message"] = ''.join(lines)
+        return block
+
+    def sift_block(self, block, bob_bases):
+        block["bob_bases"] = bob_bases
+        key_classes = block.get("classes", np.zeros(block["n"], dtype=np.int8))
+        shared_key = []
+        for a_bit, a_basis, b_basis, c in zip(block["bits"], block["bases"], bob_bases, key_classes):
+            # Only signal pulses go into the key in decoy mode
+            if a_basis == b_basis and c == decoy.SIGNAL:
+                shared_key.append(str(a_bit))
+            else:
+                shared_key.append('x')
+
+        self.log("Alice's bases: ", block["bases"])
+        self.log("Bob's bases:   ", bob_bases)
+        self.log("Shared key:    ", ''.join(k for k in shared_key if k != 'x'))
+        block["sifted"] = [int(k) for k in shared_key if k != 'x']
+
+    def sample_size(self, block):
+        # error_bits per block, or with eps_sec set the finite-size optimum for
+        # this block's sifted length (0 if it cannot yield a secure key)
+        if "eps_sec" in self.config:
+            return finite.optimal_sample(len(block["sifted"]), self.config.get("expected_qber", 0.0),
+                                         eps_sec=self.config["eps_sec"],
+                                         eps_cor=self.config.get("eps_cor", finite.EPS_COR))[0]
+        return self.config["error_bits"]
+
+    def sample_block(self, block, count):
+        # Select indices for error estimation (None if the block is too short)
+        if count <= 0 or len(block["sifted"]) < count:
+            return None
+        block["sample"] = self.key_rng.sample(len(block["sifted"]), count)
+        return block["sample"]
+
+    def finish_block(self, block, bob_sample_bits, target_mode):
+        # Error count on the sample; returns (errors, key bits kept from the block)
+        config = self.config
+        sifted_key = block["sifted"]
+        sample_bits = [sifted_key[i] for i in block["sample"]]
+        errors = sum(a != b for a, b in zip(sample_bits, bob_sample_bits))
+        k = len(block["sample"])
+        error_rate = errors / k
+        self.log(f"Error estimation: {errors} errors out of {k} samples (rate: {error_rate:.2f})")
+        if "decoy_stats" in block and self.verbose:
+            source = block["source"]
+            decoy.print_report(block["decoy_stats"], source,
+                               decoy.estimate(block["decoy_stats"], source, signal_qber=error_rate))
+
+        # Remove sample bits from the block key; in target mode only the share
+        # that survives reconciliation leakage counts towards the target
+        sampled = set(block["sample"])
+        block_key = [str(sifted_key[i]) for i in range(len(sifted_key)) if i not in sampled]
+        if "eps_sec" in config:
+            # Finite-size bound: keep what the sample proves secure, nothing if
+            # the QBER upper bound leaves no key
+            block_key = block_key[:finite.key_length(len(block_key), k, errors, eps_sec=config["eps_sec"],
+                                                     eps_cor=config.get("eps_cor", finite.EPS_COR))]
+        elif target_mode:
+            block_key = block_key[:sizing.secure_length(len(block_key), error_rate)]
+        return errors, block_key
+
+    def handshake(self, transport):
+        # Bob opens with HELLO:<session>:<blocks done>. If it is the session in
+        # Alice's journal, both roll back to the blocks they have both finished;
+        # otherwise a new session starts from block zero.
+        journal = self.journal
+        hello = transport.readline()
+        if not hello.startswith('HELLO:'):
+            return False
+        _, session, done = hello.rstrip('\n').split(':')
+        if journal.session and session == journal.session:
+            journal.rollback(min(int(done), len(journal.blocks)))
+            self.restore_random(journal.rng_state)
+            self.log(f"Alice: Resuming session {session} after block {len(journal.blocks)}")
+        else:
+            journal.start(checkpoint.new_session_id(), self.random_state())
+        transport.send(f"RESUME:{journal.session}:{len(journal.blocks)}\n")
+        return True
+
+    def run(self, transport, key_path=None, stats=None):
+        # One connection of a (possibly resumed) session. Returns "done",
+        # "aborted" or "dropped" (Bob went away; the journal keeps the finished
+        # blocks). The key ends up in self.key (and key_path); a stats dict,
+        # if given, receives the session's metrics.
+        config, journal, log = self.config, self.journal, self.log
+        n = config["num_bits"]
+        ERROR_CHECK_BITS = config["error_bits"]
+        # target_key_bits=N sizes the run automatically and keeps streaming blocks until N bits exist
+        target = config.get("target_key_bits", 0)
+        # Runs are cut into blocks of at most max_block_bits qubits; up to
+        # pipeline_depth blocks are in flight while earlier ones are sifted
+        max_block = config.get("max_block_bits", 100000)
+        depth = max(1, config.get("pipeline_depth", 2))
+        streaming = bool(target) or n > max_block
+        sift_ratio = sizing.expected_sift_ratio(config)
+        # Every block's sample feeds a running QBER bound, so a streamed session
+        # under attack stops at the first block that makes the threshold certain
+        threshold = config.get("abort_threshold", 0.2)
+        # eps_sec=<failure probability> replaces error_bits and the hard threshold
+        # with finite-size sample sizes and key lengths (qkd/finite.py)
+        finite_mode = "eps_sec" in config
+        qber_monitor = monitor.QberMonitor(threshold, config.get("monitor_alpha", 0.01))
+        expected_qber = config.get("expected_qber", 0.0)
+        # Target mode streams until the target is met, so it gives up after
+        # this many blocks in a row that add no key (QBER too high to distil)
+        max_empty = config.get("max_empty_blocks", 10)
+        empty_blocks = 0
+
+        if not self.handshake(transport):
+            log("Bob disconnected before the session started.")
+            return "dropped"
+
+        # Blocks finished before a reconnect count as done
+        key = KeyFile(key_path, journal.key())
+        for entry in journal.blocks:
+            qber_monitor.update(entry["errors"], entry["samples"])
+        sent = sum(entry["n"] for entry in journal.blocks)
+        next_id = journal.blocks[-1]["id"] + 1 if journal.blocks else 0
+
+        # auth=1 tags every classical message with Wegman-Carter MACs keyed from auth_pool.txt
+        auth_session = auth.open_session(config, "alice", self.script_dir)
+        start = time.perf_counter()
+
+        def classical(message):
+            # BLOCK data stands in for the quantum channel; everything else is authenticated
+            transport.send(auth_session.sign(message) if auth_session else message)
+
+        in_flight = {}
+        result = None
+        if target and (sizing.secret_fraction(expected_qber) <= 0 or sift_ratio <= 0):
+            log(f"expected_qber={expected_qber} with a sift ratio of {sift_ratio:.3g} leaves no secure key, "
+                f"so target_key_bits={target} cannot be reached. Aborting.")
+            result = "aborted"
+
+        def out_of_yield():
+            if target and empty_blocks >= max_empty:
+                log(f"{empty_blocks} blocks in a row yielded no secure key (session QBER "
+                    f"{qber_monitor.qber():.4f}); target_key_bits={target} cannot be reached. Aborting.")
+                return True
+            return False
+
+        while result is None:
+            # Keep the pipeline full
+            while len(in_flight) < depth:
+                if target:
+                    expected = sum(sizing.expected_key_bits(b["n"], ERROR_CHECK_BITS, sift_ratio, expected_qber)
+                                   for b in in_flight.values())
+                    remaining = target - len(key.bits) - expected
+                    if remaining <= 0:
+                        break
+                    block_bits = min(max_block, sizing.raw_qubits_for(
+                        remaining, ERROR_CHECK_BITS, sift_ratio, expected_qber))
+                    log(f"Target {target} key bits: sending a block of {block_bits} qubits")
+                else:
+                    if sent + sum(b["n"] for b in in_flight.values()) >= n:
+                        break
+                    block_bits = min(max_block, n - sent - sum(b["n"] for b in in_flight.values()))
+                block = self.new_block(next_id, block_bits)
+                transport.send(block.pop("message"))
+                in_flight[next_id] = block
+                next_id += 1
+            if not in_flight:
+                break
+
+            line = transport.readline()
+            if not line:
+                log("Bob disconnected.")
+                result = "dropped"
+                break
+            if auth_session:
+                try:
+                    line = auth_session.verify(line)
+                except auth.AuthenticationError as e:
+                    log(f"Authentication failed ({e}). Aborting.")
+                    result = "aborted"
+                    break
+            tag, k, payload = line.rstrip('\n').split(':', 2)
+            block = in_flight[int(k)]
+
+            if tag == 'BASES':
+                self.sift_block(block, payload.split(','))
+                if self.protocol == "decoy":
+                    # Announce intensity classes; Bob reveals his bits on the sifted decoy/vacuum pulses
+                    classical(f'CLASSES:{k}:' + ''.join(decoy.CLASS_CODES[c] for c in block["classes"]) + '\n')
+                    continue
+            elif tag == 'DECOY':
+                bob_decoy_bits = [int(b) for b in payload.split(',') if b]
+                clicked = np.array([b != '-' for b in block["bob_bases"]])
+                sifted = np.array([a == b for a, b in zip(block["bases"], block["bob_bases"])])
+                block["decoy_stats"] = decoy.stats_from_exchange(
+                    block["classes"], clicked, sifted, block["bits"], bob_decoy_bits)
+            elif tag == 'BITS':
+                del in_flight[int(k)]
+                samples = len(block["sample"])
+                errors, block_key = self.finish_block(block, list(map(int, payload.split(','))), bool(target))
+                status = qber_monitor.update(errors, samples)
+                if streaming:
+                    log(f"Block {k}: {qber_monitor.report()}")
+                if finite_mode and not block_key:
+                    log("QBER upper bound leaves no secure key. Aborting.")
+                    result = "aborted"
+                    break
+                # A single-block session is judged on its own QBER; the
+                # monitor only cuts streamed sessions short. Finite mode has
+                # no fixed threshold: its key length bound decides instead
+                if not finite_mode and (status == monitor.ABORT if streaming else errors / samples > threshold):
+                    log("Error rate too high! Possible eavesdropping. Aborting.")
+                    if streaming:
+                        log(f"Attack detected after {time.perf_counter() - start:.3f} s, "
+                            f"{len(in_flight)} blocks in flight and the rest of the session skipped")
+                    result = "aborted"
+                    break
+                empty_blocks = 0 if block_key else empty_blocks + 1
+                if out_of_yield():
+                    result = "aborted"
+                    break
+                if target:
+                    block_key = block_key[:max(0, target - len(key.bits))]
+                classical(f"KEEP:{k}:{len(block_key)}\n")
+                # Key bits are usable as soon as their block is done
+                key.extend(block_key)
+                sent += block["n"]
+                journal.add_block({"id": int(k), "n": block["n"], "bits": ''.join(block_key),
+                                   "errors": errors, "samples": samples}, self.random_state())
+                log(f"Block {k}: {len(block_key)} key bits, {len(key.bits)} total "
+                    f"after {time.perf_counter() - start:.2f} s")
+                continue
+
+            # After the bases (and decoy) round: ask Bob for the error-estimation sample
+            sample_indices = self.sample_block(block, self.sample_size(block))
+            if sample_indices is None:
+                if not streaming:
+                    log("Not enough sifted bits for error estimation. Aborting.")
+                    result = "aborted"
+                    break
+                log("Not enough sifted bits for error estimation in this block. Skipping it.")
+                del in_flight[int(k)]
+                classical(f"KEEP:{k}:0\n")
+                sent += block["n"]
+                journal.add_block({"id": int(k), "n": block["n"], "bits": '', "errors": 0, "samples": 0},
+                                  self.random_state())
+                empty_blocks += 1
+                if out_of_yield():
+                    result = "aborted"
+                    break
+                continue
+            classical(f'SAMPLE:{k}:' + ','.join(map(str, sample_indices)) + '\n')
+
+        if result is None and streaming and not finite_mode and qber_monitor.qber() > threshold:
+            # The running bound may not have become certain; the session
+            # as a whole still has to meet the threshold
+            log(f"Session QBER {qber_monitor.qber():.4f} above {threshold}. Aborting.")
+            result = "aborted"
+        if result == "aborted":
+            key.truncate(0)
+            classical("ABORT\n")
+        elif result is None:
+            result = "done"
+            classical(f"DONE:{len(key.bits)}\n")
+            if auth_session and config.get("auth_replenish", 0) and len(key.bits) > auth_session.used_bits():
+                # Refill the pool from the end of the new key by as much as this session used
+                used = auth_session.used_bits()
+                refill = key.bits[-used:]
+                key.truncate(len(key.bits) - used)
+                auth_session.pool.add(''.join(refill))
+            log("Final key: ", ''.join(key.bits))
+        key.close()
+        self.key = ''.join(key.bits)
+        if auth_session:
+            log(auth_session.close(result == "done"))
+        if stats is not None:
+            stats.update(session=journal.session, key_bits=len(key.bits), blocks=len(journal.blocks),
+                         samples=qber_monitor.samples, qber=qber_monitor.qber())
+        if result != "dropped":
+            journal.clear()
+        return result
+
+
+class Bob(Role):
+    role = "bob"
+
+    def __init__(self, config, rng=None, key_rng=None, journal=None, script_dir=None, log=print, channel=None):
+        super().__init__(config, rng, key_rng, journal, script_dir, log)
+        self.channel = channel or channel_from_config(config)
+
+    def send_classical(self, transport, auth_session, message):
+        # Tag classical messages when authentication is on
+        if auth_session:
+            message = auth_session.sign(message)
+        transport.send(message)
+
+    def measure_block(self, transport, k, n, auth_session):
+        # Measure BLOCK k (n qubits) and announce the bases; returns the block state
+        alice_bits = []
+        alice_bases = []
+        photons = []
+
+        # Receive n lines of data from Alice
+        while len(alice_bases) < n:
+            line = transport.readline()
+            if not line:
+                return None
+            if '|' in line:
+                fields = line.strip().split('|')
+                alice_bases.append(fields[0])
+                alice_bits.append(int(fields[1]))
+                if len(fields) > 2:
+                    photons.append(int(fields[2]))
+
+        # Bob randomly picks his bases and measures the whole batch at once
+        bob_bases = kernel.basis_names(self.bases[self.key_rng.integers(len(self.bases), n)])
+        if photons:
+            bob_results = measure_pulses(alice_bits, alice_bases, bob_bases, photons, self.config, self.rng)
+        else:
+            bob_results = measure_bits(alice_bits, alice_bases, bob_bases, self.channel, self.rng)
+        if self.verbose:
+            for measured_bit, bob_basis in zip(bob_results, bob_bases):
+                if measured_bit == kernel.NO_CLICK:
+                    self.log(f"Bob detected nothing in basis {bob_basis}")
+                else:
+                    self.log(f"Bob measured bit {measured_bit} in basis {bob_basis}")
+
+        # Send bob's bases back to Alice ('-' marks a lost photon so it is sifted out)
+        announced_bases = [b if r != kernel.NO_CLICK else '-' for b, r in zip(bob_bases, bob_results)]
+        self.send_classical(transport, auth_session, f'BASES:{k}:' + ','.join(announced_bases) + '\n')
+        self.log("Bob: Bases sent for reconciliation")
+
+        # Sift Bob's key to match Alice's sifted key
+        sifted_indices = [i for i, (a, b) in enumerate(zip(alice_bases, announced_bases)) if a == b]
+        return {"results": bob_results, "sifted_indices": sifted_indices, "key": []}
+
+    def handshake(self, transport):
+        # Offer the session in Bob's journal; Alice answers with the session to
+        # run and the number of finished blocks both sides keep
+        journal = self.journal
+        transport.send(f"HELLO:{journal.session or '-'}:{len(journal.blocks)}\n")
+        reply = transport.readline()
+        if not reply.startswith('RESUME:'):
+            return False
+        _, session, done = reply.rstrip('\n').split(':')
+        if session == journal.session:
+            journal.rollback(int(done))
+            self.restore_random(journal.rng_state)
+            self.log(f"Bob: Resuming session {session} after block {len(journal.blocks)}")
+        else:
+            journal.start(session, self.random_state())
+            self.log(f"Bob: Session {session}")
+        return True
+
+    def run(self, transport, key_path=None):
+        # Returns "done", "aborted" or "dropped", like Alice.run
+        config, journal, log = self.config, self.journal, self.log
+        if not self.handshake(transport):
+            return "dropped"
+        auth_session = auth.open_session(config, "bob", self.script_dir)
+
+        # Alice streams tagged BLOCK/CLASSES/SAMPLE/KEEP messages for the blocks
+        # in flight and finishes with DONE:<length> (or ABORT)
+        key = KeyFile(key_path, journal.key())
+        blocks = {}
+        try:
+            while True:
+                data = transport.readline()
+                if not data:
+                    log("Bob: Lost the connection to Alice")
+                    if auth_session:
+                        auth_session.close(False)
+                    return "dropped"
+                if auth_session and not data.startswith('BLOCK:'):
+                    try:
+                        data = auth_session.verify(data)
+                    except auth.AuthenticationError as e:
+                        log(f"Bob: Authentication failed ({e})")
+                        data = 'ABORT'
+                if data.startswith('ABORT'):
+                    log("Bob: Alice aborted the session")
+                    key.truncate(0)
+                    if auth_session:
+                        log(auth_session.close(False))
+                    journal.clear()
+                    return "aborted"
+                if data.startswith('DONE:'):
+                    if auth_session and config.get("auth_replenish", 0) and len(key.bits) > auth_session.used_bits():
+                        # Same refill as Alice: the pool gets the end of the new key
+                        used = auth_session.used_bits()
+                        refill = key.bits[-used:]
+                        key.truncate(len(key.bits) - used)
+                        auth_session.pool.add(''.join(refill))
+                    break
+                tag, k, payload = data.rstrip('\n').split(':', 2)
+                k = int(k)
+                if tag == 'BLOCK':
+                    block = self.measure_block(transport, k, int(payload), auth_session)
+                    if block is not None:
+                        blocks[k] = block
+                    continue
+                block = blocks[k]
+                if tag == 'CLASSES':
+                    # Alice announces the intensity classes; reveal the sifted decoy/vacuum bits
+                    # and keep only the signal pulses for the key
+                    results, sifted_indices = block["results"], block["sifted_indices"]
+                    revealed = [str(results[i]) for i in sifted_indices if payload[i] != 's']
+                    self.send_classical(transport, auth_session, f'DECOY:{k}:' + ','.join(revealed) + '\n')
+                    block["sifted_indices"] = [i for i in sifted_indices if payload[i] == 's']
+                elif tag == 'SAMPLE':
+                    # Receive sample indices from Alice and prepare the sample
+                    sifted_key = [int(block["results"][i]) for i in block["sifted_indices"]]
+                    sample_indices = list(map(int, payload.split(',')))
+                    # Only use up to error_bits if needed (defensive); finite-size
+                    # mode sizes the sample per block
+                    if "eps_sec" not in config:
+                        sample_indices = sample_indices[:config["error_bits"]]
+                    sample_bits = [sifted_key[i] for i in sample_indices]
+
+                    # Send the sample back to Alice
+                    self.send_classical(transport, auth_session, f'BITS:{k}:' + ','.join(map(str, sample_bits)) + '\n')
+
+                    # Remove sample from the block key
+                    sampled = set(sample_indices)
+                    block["key"] = [str(sifted_key[i]) for i in range(len(sifted_key)) if i not in sampled]
+                elif tag == 'KEEP':
+                    # Block finished: its key bits are final straight away
+                    block_key = blocks.pop(k)["key"][:int(payload)]
+                    key.extend(block_key)
+                    journal.add_block({"id": k, "n": len(block["results"]), "bits": ''.join(block_key)},
+                                      self.random_state())
+        finally:
+            key.close()
+            self.key = ''.join(key.bits)
+        log("Bob's final key: ", self.key)
+        if auth_session:
+            log(auth_session.close(True))
+        journal.clear()
+        return "done"
+
+
+def generate_key(config, alice=None, bob=None):
+    # A whole session inside this process: Alice runs on a thread, Bob on the
+    # caller's, over a loopback transport. Returns (result, alice_key, bob_key);
+    # the keys only match on a noiseless channel (there is no error correction).
+    alice = alice or Alice(config, log=None)
+    bob = bob or Bob(config, log=None)
+    alice_end, bob_end = loopback()
+    outcome = {}
+
+    def run_alice():
+        try:
+            outcome["result"] = alice.run(alice_end)
+        except Exception as e:
+            outcome["error"] = e
+        finally:
+            alice_end.close()
+
+    thread = threading.Thread(target=run_alice, daemon=True)
+    thread.start()
+    try:
+        bob.run(bob_end)
+    finally:
+        bob_end.close()
+        thread.join()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"], alice.key, bob.key
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run QKD sessions in-process over the loopback transport")
+    parser.add_argument('--sessions', type=int, default=10)
+    parser.add_argument('--num-bits', type=int, help="override num_bits from the config file")
+    args = parser.parse_args()
+
+    config = load_config(defaults={"num_bits": 32, "error_bits": 5})
+    if args.num_bits:
+        config["num_bits"] = args.num_bits
+    start = time.perf_counter()
+    matched = 0
+    for _ in range(args.sessions):
+        result, alice_key, bob_key = generate_key(config)
+        matched += result == "done" and alice_key == bob_key
+    seconds = time.perf_counter() - start
+    print(f"{args.sessions} sessions of {config['num_bits']} qubits in {seconds:.3f} s "
+          f"({seconds / args.sessions * 1e3:.2f} ms each), {matched} with matching keys")
+
+
+if __name__ == '__main__':
+    main()
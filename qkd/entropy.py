@@ -0,0 +1,10 @@
+import numpy as np
+
+
+def binary_entropy(p):
+    # h(p) in bits, vectorized; h(0) = h(1) = 0
+    p = np.clip(np.asarray(p, dtype=float), 0.0, 1.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        h = -p * np.log2(p) - (1 - p) * np.log2(1 - p)
+    h = np.nan_to_num(h, nan=0.0)
+    return float(h) if h.ndim == 0 else h
@@ -0,0 +1,92 @@
+import collections
+import threading
+
+from PyQt5.QtCore import QThread, QTimer, pyqtSignal
+
+from qkd.logview import FRAME_MS
+
+# Output of a supervised child (qkd.supervisor), forwarded to the GUI thread.
+#
+# Emitting one queued signal per line lets a chatty script (Bob prints a
+# line per qubit) flood the GUI's event queue. ScriptRunner's thread
+# instead collects lines in a buffer and keeps at most one queued
+# notification outstanding. At most once per frame, the GUI thread takes
+# up to MAX_BATCH lines from the buffer and calls the output_signal
+# handlers for each one. The GUI's work per second therefore stays the
+# same however much a script prints. A burst waits in the buffer and is
+# delivered over the next frames. Once more than MAX_PENDING lines are
+# waiting, the oldest are dropped and reported as one "[N lines dropped]"
+# line. done_signal fires once the child has exited and every line has
+# been delivered.
+
+MAX_BATCH = 200
+MAX_PENDING = 5000
+
+
+class ScriptRunner(QThread):
+    output_signal = pyqtSignal(str)
+    done_signal = pyqtSignal()
+    _notify = pyqtSignal()
+
+    def __init__(self, child):
+        super().__init__()
+        self.child = child
+        self.lock = threading.Lock()
+        self.pending = collections.deque()
+        self.dropped = 0
+        self.notified = False
+        self.done = False
+        # Emitted from run(), delivered on the GUI thread that owns us
+        self._notify.connect(self._deliver)
+        self.finished.connect(self._finish)
+
+    def run(self):
+        for line in self.child.lines():
+            with self.lock:
+                if len(self.pending) == MAX_PENDING:
+                    self.pending.popleft()
+                    self.dropped += 1
+                self.pending.append(line)
+                notify = not self.notified
+                self.notified = True
+            if notify:
+                self._notify.emit()
+
+    def _deliver(self):
+        with self.lock:
+            lines = [self.pending.popleft() for _ in range(min(MAX_BATCH, len(self.pending)))]
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            self.output_signal.emit(f"[{dropped} lines dropped]")
+        for line in lines:
+            self.output_signal.emit(line)
+        # No further delivery until the next frame
+        QTimer.singleShot(FRAME_MS, self._rearm)
+
+    def _rearm(self):
+        with self.lock:
+            more = bool(self.pending)
+            if not more:
+                self.notified = False
+        if more:
+            self._deliver()
+        elif self.isFinished():
+            self._done()
+
+    def _finish(self):
+        # A delivery still in flight reports done from _rearm instead
+        with self.lock:
+            idle = not self.notified
+        if idle:
+            self._done()
+
+    def _done(self):
+        if not self.done:
+            self.done = True
+            self.done_signal.emit()
+
+    def stop(self):
+        self.child.stop()
+
+    def send_stdin(self, msg):
+        self.child.send(msg)
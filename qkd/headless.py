@@ -0,0 +1,255 @@
+import argparse
+import json
+import os
+import queue
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from qkd import links, supervisor, warm
+from qkd.config import load_config
+
+# The GUIs' pipeline without the GUI.
+#
+# Key generation, the classical encrypted chat and MITM mode are run the
+# way the GUIs run them: the same scripts, started on warm workers
+# (qkd.warm) and managed by qkd.supervisor, talking over the links from
+# the config file. Results are printed as JSON lines on stdout, one per
+# key generation run or chat, plus a summary line, so batch jobs and
+# throughput runs can read them. The scripts' own output goes to stderr
+# with --verbose.
+#
+#   python3 -m qkd.headless keygen --runs 20 --num-bits 32 --error-bits 4
+#   python3 -m qkd.headless chat --messages 100 --mitm
+#   python3 -m qkd.headless run            # one key, then a chat with it
+#
+# Keys are written where the GUIs write them (next to the scripts), which
+# is where the classical scripts read them; keygen --output-dir keeps them
+# elsewhere. The exit status is 1 when any run or message failed.
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+ALICE_DIR = os.path.join(ROOT, "Alice")
+BOB_DIR = os.path.join(ROOT, "Bob")
+MITM_DIR = os.path.join(ROOT, "MITM")
+TIMEOUT = 60.0
+
+
+def emit(record):
+    print(json.dumps(record), flush=True)
+
+
+class Output:
+    # Lines of one supervised child, read on a background thread
+    def __init__(self, child, verbose=False):
+        self.child = child
+        self.verbose = verbose
+        self.lines = queue.Queue()
+        self.thread = threading.Thread(target=self._read, daemon=True)
+        self.thread.start()
+
+    def _read(self):
+        for line in self.child.lines():
+            if self.verbose:
+                print(f"[{self.child.name}] {line}", file=sys.stderr)
+            self.lines.put(line)
+
+    def expect(self, text, timeout=TIMEOUT):
+        # Wait for a line containing `text`; False on timeout or exit
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                line = self.lines.get(timeout=min(remaining, 0.1))
+            except queue.Empty:
+                if self.child.done.is_set() and self.lines.empty():
+                    return False
+                continue
+            if text in line:
+                return True
+
+    def count(self, text):
+        # Lines containing `text` among those not consumed yet
+        found = 0
+        while not self.lines.empty():
+            found += text in self.lines.get()
+        return found
+
+
+def _read_key(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def keygen(sup, runs, settings, output_dir=None, verbose=False):
+    # Runs alice.py and bob.py `runs` times; returns (records, summary)
+    alice_out = os.path.join(output_dir, "alice") if output_dir else ALICE_DIR
+    bob_out = os.path.join(output_dir, "bob") if output_dir else BOB_DIR
+    alice_key = os.path.join(alice_out, "final_key_alice.txt")
+    bob_key = os.path.join(bob_out, "final_key_bob.txt")
+    args = []
+    for setting in settings:
+        args += ["--set", setting]
+    records = []
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        for run in range(runs):
+            rendezvous = os.path.join(tmp, f"rendezvous-{run}.json")
+            common = args + ["--rendezvous", rendezvous]
+            for path in (alice_key, bob_key):
+                if os.path.exists(path):
+                    os.remove(path)
+            run_start = time.perf_counter()
+            alice = sup.start("qkd_alice", ["python3", "-u", "alice.py", "--port", "0", "--set",
+                                            f"output_dir={alice_out}"] + common, ALICE_DIR)
+            bob = sup.start("qkd_bob", ["python3", "-u", "bob.py", "--set", f"output_dir={bob_out}"] + common,
+                            BOB_DIR)
+            outputs = [Output(alice, verbose), Output(bob, verbose)]
+            finished = alice.done.wait(TIMEOUT) and bob.done.wait(TIMEOUT)
+            for output in outputs:
+                output.thread.join(1)
+            seconds = time.perf_counter() - run_start
+            key_a, key_b = _read_key(alice_key), _read_key(bob_key)
+            if not finished or alice.returncode or bob.returncode:
+                result = "failed"
+                sup.stop("qkd_alice")
+                sup.stop("qkd_bob")
+            elif not key_a:
+                result = "aborted"
+            else:
+                result = "ok" if key_a == key_b else "mismatch"
+            record = {"event": "keygen", "run": run, "result": result, "key_bits": len(key_a or ""),
+                      "keys_match": bool(key_a) and key_a == key_b, "seconds": round(seconds, 4),
+                      "alice_exit": alice.returncode, "bob_exit": bob.returncode}
+            records.append(record)
+            emit(record)
+    total = time.perf_counter() - start
+    key_bits = sum(r["key_bits"] for r in records if r["result"] == "ok")
+    summary = {"event": "summary", "command": "keygen", "runs": runs,
+               "results": {name: sum(r["result"] == name for r in records)
+                           for name in ("ok", "aborted", "mismatch", "failed")},
+               "seconds": round(total, 4), "runs_per_second": round(runs / total, 3),
+               "key_bits_per_second": round(key_bits / total, 2),
+               "mean_run_seconds": round(statistics.mean(r["seconds"] for r in records), 4) if records else None}
+    emit(summary)
+    return records, summary
+
+
+def chat(sup, messages, mitm=False, verbose=False):
+    # Alternates messages Alice->Bob and Bob->Alice through the classical
+    # scripts (and the MITM with mitm=True); returns the summary record
+    config = load_config()
+    flag = ["--mitm"] if mitm else []
+    sup.stop("classical_alice")
+    sup.stop("classical_bob")
+    sup.stop("mitm")
+    start = time.perf_counter()
+    proxy = None
+    if mitm:
+        # Alice and Bob connect to the MITM, so they start once it listens
+        child = sup.start("mitm", ["python3", "-u", "classical_mitm.py"], MITM_DIR,
+                          ready_line="MITM: Waiting for Alice and Bob", restart="on-failure")
+        proxy = Output(child, verbose)
+        if not child.ready.wait(TIMEOUT):
+            emit({"event": "summary", "command": "chat", "mitm": True, "error": "MITM did not start"})
+            return None
+    alice = sup.start("classical_alice", ["python3", "-u", "classical_alice.py"] + flag, ALICE_DIR,
+                      ready_link=None if mitm else links.address(config, "alice"), restart="on-failure")
+    bob = sup.start("classical_bob", ["python3", "-u", "classical_bob.py"] + flag, BOB_DIR,
+                    ready_link=None if mitm else links.address(config, "bob"), restart="on-failure")
+    outputs = {"alice": Output(alice, verbose), "bob": Output(bob, verbose)}
+    ready = alice.ready.wait(TIMEOUT) and bob.ready.wait(TIMEOUT)
+    startup = time.perf_counter() - start
+    latencies = []
+    lost = 0
+    if ready:
+        chat_start = time.perf_counter()
+        for i in range(messages):
+            sender, receiver, label = (alice, "bob", "Bob") if i % 2 == 0 else (bob, "alice", "Alice")
+            text = f"headless message {i}"
+            sent = time.perf_counter()
+            sender.send(text)
+            if outputs[receiver].expect(f"[{label}] Received: {text}"):
+                latencies.append(time.perf_counter() - sent)
+            else:
+                lost += 1
+        chat_seconds = time.perf_counter() - chat_start
+    else:
+        chat_seconds = 0.0
+    summary = {"event": "summary", "command": "chat", "mitm": mitm, "ready": ready,
+               "startup_seconds": round(startup, 4), "messages": messages, "delivered": len(latencies),
+               "lost": lost + (0 if ready else messages),
+               "messages_per_second": round(len(latencies) / chat_seconds, 2) if chat_seconds else 0.0}
+    if latencies:
+        latencies.sort()
+        summary["latency_ms"] = {"median": round(statistics.median(latencies) * 1000, 3),
+                                 "p95": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 3),
+                                 "max": round(latencies[-1] * 1000, 3)}
+    if proxy:
+        summary["intercepted"] = proxy.count("MITM intercepted")
+    emit(summary)
+    return summary
+
+
+def count(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {value}")
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run QKD key generation and the classical chat without the GUI")
+    parser.add_argument('--verbose', action='store_true', help="copy the scripts' output to stderr")
+    parser.add_argument('--workers', type=int, default=2, help="warm workers kept ready")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("keygen", "run"):
+        command = commands.add_parser(name)
+        command.add_argument('--num-bits', type=int)
+        command.add_argument('--error-bits', type=int)
+        command.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                             help="extra session setting for alice.py and bob.py")
+        if name == "keygen":
+            command.add_argument('--runs', type=count, default=1)
+            command.add_argument('--output-dir', help="keep the keys here instead of next to the scripts")
+    for name in ("chat", "run"):
+        command = commands.choices.get(name) or commands.add_parser(name)
+        command.add_argument('--messages', type=int, default=10)
+        command.add_argument('--mitm', action='store_true', help="route the chat through the MITM proxy")
+    args = parser.parse_args()
+
+    pool = warm.Pool(args.workers)
+    sup = supervisor.Supervisor(pool)
+    failed = False
+    have_key = True
+    try:
+        if args.command in ("keygen", "run"):
+            settings = list(args.set)
+            if args.num_bits is not None:
+                settings.append(f"num_bits={args.num_bits}")
+            if args.error_bits is not None:
+                settings.append(f"error_bits={args.error_bits}")
+            records, _ = keygen(sup, getattr(args, "runs", 1), settings, getattr(args, "output_dir", None),
+                                args.verbose)
+            failed = any(r["result"] in ("failed", "mismatch") for r in records)
+            have_key = records[-1]["result"] == "ok"
+        if args.command == "chat" or (args.command == "run" and have_key):
+            summary = chat(sup, args.messages, args.mitm, args.verbose)
+            failed = failed or not summary or summary["lost"] > 0
+        elif args.command == "run":
+            # No key to chat with
+            failed = True
+    finally:
+        sup.stop_all()
+        pool.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
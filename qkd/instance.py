@@ -0,0 +1,63 @@
+import atexit
+import os
+import tempfile
+import time
+
+# One running copy per classical script.
+#
+# Each script records its pid in a file under the temp directory and, on
+# start, stops the copy recorded there. That replaces walking every process
+# on the machine with psutil at import time: the usual start (no earlier
+# copy still running) reads one missing file, and psutil is only imported
+# to confirm that a recorded pid really is the script before killing it.
+# The file also holds the time it was written: the recorded process was
+# already running then, so a process started later only has a recycled pid
+# and is left alone. That matters for the GUIs' warm workers (qkd.warm),
+# whose command line does not name the script they run.
+
+
+def pid_path(name):
+    return os.path.join(tempfile.gettempdir(), f"qkd-{name}.pid")
+
+
+def _running_copy(pid, recorded, script):
+    import psutil
+    try:
+        process = psutil.Process(pid)
+        if process.create_time() > recorded:
+            return None
+        cmdline = ' '.join(process.cmdline())
+        return process if script in cmdline or "qkd.warm" in cmdline else None
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return None
+
+
+def replace_previous(script):
+    # Kill the earlier instance of `script` (a file name like classical_bob.py)
+    # and register this process in its place
+    path = pid_path(os.path.splitext(script)[0])
+    try:
+        with open(path) as f:
+            pid, recorded = f.read().split()
+            pid, recorded = int(pid), float(recorded)
+    except (OSError, ValueError):
+        pid = None
+    if pid and pid != os.getpid():
+        previous = _running_copy(pid, recorded, script)
+        if previous:
+            previous.kill()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(f"{os.getpid()} {time.time()}")
+    os.replace(tmp, path)
+    atexit.register(_release, path)
+
+
+def _release(path):
+    # Remove the pid file unless a newer instance has taken it over
+    try:
+        with open(path) as f:
+            if int(f.read().split()[0]) == os.getpid():
+                os.remove(path)
+    except (OSError, ValueError):
+        pass
@@ -0,0 +1,89 @@
+import numpy as np
+
+# Batched single-qubit kernel.
+#
+# Every qubit in a batch is stored as its Bloch vector (one row of an (n, 3)
+# array), so preparation, channel noise and measurement are plain array
+# operations instead of one cirq circuit per qubit. The BB84 states map to
+# the poles of the sphere:
+#   Z basis: |0> = +z, |1> = -z      X basis: |+> = +x, |-> = -x
+# which is what prepare_qubit() in alice.py builds with X and H gates.
+
+Z = 0
+X = 1
+Y = 2
+BASIS_NAMES = ('Z', 'X', 'Y')
+BASIS_AXES = np.array([
+    [0.0, 0.0, 1.0],  # Z
+    [1.0, 0.0, 0.0],  # X
+    [0.0, 1.0, 0.0],  # Y
+])
+
+# Sign applied to each Bloch component by I, X, Y, Z
+PAULI_SIGNS = np.array([
+    [1.0, 1.0, 1.0],
+    [1.0, -1.0, -1.0],
+    [-1.0, 1.0, -1.0],
+    [-1.0, -1.0, 1.0],
+])
+
+NO_CLICK = -1
+
+
+def basis_index(names):
+    # 'Z'/'X'/'Y' strings (or an array of them) -> basis indices
+    lookup = {name: i for i, name in enumerate(BASIS_NAMES)}
+    return np.array([lookup[n] for n in names], dtype=np.int8)
+
+
+def basis_names(indices):
+    return [BASIS_NAMES[i] for i in indices]
+
+
+def axis_in_xz(theta):
+    # Measurement axis at angle theta from +z towards +x (used by E91/B92)
+    theta = np.asarray(theta, dtype=float)
+    return np.stack([np.sin(theta), np.zeros_like(theta), np.cos(theta)], axis=-1)
+
+
+class QubitBatch:
+    def __init__(self, bloch, detected=None):
+        self.bloch = bloch
+        if detected is None:
+            detected = np.ones(len(bloch), dtype=bool)
+        self.detected = detected
+
+    def __len__(self):
+        return len(self.bloch)
+
+
+def prepare(bits, bases):
+    # Encode bits in the given bases; bit 1 is the antipodal state
+    bits = np.asarray(bits)
+    signs = 1.0 - 2.0 * bits
+    return QubitBatch(BASIS_AXES[np.asarray(bases)] * signs[:, None])
+
+
+def prepare_on_axes(bits, axes):
+    # Same as prepare() but with an explicit (n, 3) array of axes
+    signs = 1.0 - 2.0 * np.asarray(bits)
+    return QubitBatch(np.asarray(axes, dtype=float) * signs[:, None])
+
+
+def measure_on_axes(batch, axes, rng):
+    # Projective measurement along each row of axes.
+    # Outcome 0 is the +axis eigenstate; undetected qubits give NO_CLICK.
+    p0 = 0.5 * (1.0 + np.einsum('ij,ij->i', batch.bloch, axes))
+    outcomes = (rng.random(len(batch)) >= p0).astype(np.int8)
+    outcomes[~batch.detected] = NO_CLICK
+    return outcomes
+
+
+def measure(batch, bases, rng):
+    return measure_on_axes(batch, BASIS_AXES[np.asarray(bases)], rng)
+
+
+def apply_paulis(batch, paulis):
+    # paulis: array of 0=I, 1=X, 2=Y, 3=Z, one per qubit
+    batch.bloch = batch.bloch * PAULI_SIGNS[paulis]
+    return batch
@@ -0,0 +1,121 @@
+import argparse
+import os
+import socket
+import time
+
+# Addresses for the links between the scripts and the GUIs:
+#
+#     tcp:HOST:PORT   TCP, for peers on other hosts (the default)
+#     unix:PATH       Unix domain socket, for peers on the same host
+#
+# Each link is chosen with a config key, link_<name> (qkd, alice, bob),
+# so the QKD and classical links can be switched independently. listen()
+# and connect() return plain sockets either way, so the code on top does
+# not care which one it got.
+
+HOST = '127.0.0.1'
+DEFAULT_PORTS = {"qkd": 65432, "alice": 65433, "bob": 65434}
+
+
+def address(config, link, port=None, host=HOST):
+    # link_<name> from the config, else TCP on the link's usual port
+    return config.get(f"link_{link}", f"tcp:{host}:{DEFAULT_PORTS[link] if port is None else port}")
+
+
+def parse(addr):
+    # "tcp:h:p" -> ("tcp", (h, p)); "unix:p" -> ("unix", p)
+    kind, _, target = addr.partition(':')
+    if kind == "tcp":
+        host, _, port = target.rpartition(':')
+        return kind, (host or HOST, int(port))
+    if kind == "unix" and target:
+        return kind, target
+    raise ValueError(f"unknown link address {addr!r} (expected tcp:HOST:PORT or unix:PATH)")
+
+
+def listen(addr, backlog=5):
+    kind, target = parse(addr)
+    if kind == "unix":
+        # A socket file left by an earlier run would make bind fail
+        if os.path.exists(target):
+            os.remove(target)
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    s.bind(target)
+    s.listen(backlog)
+    return s
+
+
+def connect(addr, timeout=None):
+    kind, target = parse(addr)
+    s = socket.socket(socket.AF_UNIX if kind == "unix" else socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        # timeout bounds the connect only; the socket blocks afterwards
+        s.settimeout(timeout)
+        s.connect(target)
+        s.settimeout(None)
+    except OSError:
+        s.close()
+        raise
+    return s
+
+
+def bound(listener):
+    # Address a listener is reachable at (resolves tcp port 0)
+    if listener.family == socket.AF_UNIX:
+        return f"unix:{listener.getsockname()}"
+    host, port = listener.getsockname()[:2]
+    return f"tcp:{host}:{port}"
+
+
+def describe(peer):
+    # Printable form of the address accept() returned
+    if isinstance(peer, tuple):
+        return f"{peer[0]}:{peer[1]}"
+    return peer or "local peer"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Round-trip latency and throughput of a link type")
+    parser.add_argument('--link', default="tcp", choices=["tcp", "unix"])
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--size', type=int, default=64, help="message size in bytes")
+    args = parser.parse_args()
+
+    addr = {"tcp": f"tcp:{HOST}:0",
+            "unix": f"unix:/tmp/qkd-links-{os.getpid()}.sock"}[args.link]
+    listener = listen(addr)
+    addr = bound(listener)
+    message = b'x' * (args.size - 1) + b'\n'
+
+    pid = os.fork()
+    if pid == 0:
+        # Echo peer
+        listener.close()
+        with connect(addr, timeout=10) as peer:
+            reader = peer.makefile('rb')
+            for _ in range(args.messages):
+                peer.sendall(reader.readline())
+        os._exit(0)
+
+    conn, _ = listener.accept()
+    reader = conn.makefile('rb')
+    cpu, start = time.process_time(), time.perf_counter()
+    for _ in range(args.messages):
+        conn.sendall(message)
+        reader.readline()
+    seconds, cpu = time.perf_counter() - start, time.process_time() - cpu
+    os.waitpid(pid, 0)
+    conn.close()
+    listener.close()
+    if args.link == "unix":
+        os.remove(parse(addr)[1])
+    print(f"{args.link:>4}: {seconds / args.messages * 1e6:.1f} us round trip, "
+          f"{cpu / args.messages * 1e6:.1f} us CPU per message (this side), "
+          f"{2 * args.messages * args.size / seconds / 1e6:.1f} MB/s")
+
+
+if __name__ == '__main__':
+    main()
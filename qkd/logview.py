@@ -0,0 +1,62 @@
+import collections
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QPlainTextEdit
+
+# Log pane for the GUIs.
+#
+# The visualization areas used to be a QLabel whose whole text was read,
+# extended by one line and set again, with a forced repaint, for every
+# line. That is quadratic in the log length and blocks the GUI thread.
+# LogView is a read-only QPlainTextEdit that keeps at most `max_lines`
+# lines (older ones are dropped). append() only queues the line; a frame
+# timer inserts everything queued since the last frame in one edit. It
+# follows new lines only while the view is scrolled to the bottom, so
+# scrolling back to read is not interrupted. Only the GUIs import this
+# module, since it needs PyQt5.
+
+MAX_LINES = 5000
+FRAME_MS = 16
+
+
+class LogView(QPlainTextEdit):
+    def __init__(self, parent=None, max_lines=MAX_LINES):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setUndoRedoEnabled(False)
+        self.setMaximumBlockCount(max_lines)
+        # Lines beyond max_lines would be dropped on insert anyway
+        self.pending = collections.deque(maxlen=max_lines)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(FRAME_MS)
+        self.timer.timeout.connect(self.flush)
+
+    def append(self, text):
+        self.pending.append(text)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        if not self.pending:
+            return
+        bar = self.verticalScrollBar()
+        following = bar.value() >= bar.maximum() - 2
+        text = "\n".join(self.pending)
+        self.pending.clear()
+        self.appendPlainText(text)
+        if following:
+            bar.setValue(bar.maximum())
+
+    def setText(self, text):
+        # Replace the whole log with `text`
+        self.pending.clear()
+        self.setPlainText(text)
+
+    def text(self):
+        self.flush()
+        return self.toPlainText()
+
+    def clear(self):
+        self.pending.clear()
+        super().clear()
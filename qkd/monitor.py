@@ -0,0 +1,64 @@
+import math
+from statistics import NormalDist
+
+# Running QBER monitor for streamed sessions.
+#
+# Every block contributes its error-estimation sample as soon as it is
+# sifted. The session is aborted once the one-sided lower Wilson bound of
+# the QBER seen so far lies above the abort threshold, i.e. once the
+# threshold is exceeded with confidence 1 - alpha, without waiting for the
+# remaining blocks. A session whose QBER sits below the threshold is never
+# aborted by the monitor, however close to the threshold it is; the
+# end-of-session check on the plain QBER still applies to those.
+
+CONTINUE = 0
+ABORT = 1
+
+
+class QberMonitor:
+    def __init__(self, threshold=0.2, alpha=0.01):
+        # alpha: chance of aborting a session whose QBER is exactly the threshold
+        if not 0 < threshold < 1:
+            raise ValueError("need 0 < threshold < 1")
+        if not 0 < alpha < 0.5:
+            raise ValueError("need 0 < alpha < 0.5")
+        self.threshold = threshold
+        self.alpha = alpha
+        self.errors = 0
+        self.samples = 0
+        self.status = CONTINUE
+
+    def update(self, errors, samples):
+        # Add one block's sample; returns ABORT once the threshold is exceeded with confidence
+        self.errors += errors
+        self.samples += samples
+        if self.lower_bound() > self.threshold:
+            self.status = ABORT
+        return self.status
+
+    def qber(self):
+        return self.errors / self.samples if self.samples else 0.0
+
+    def bounds(self, confidence=0.95):
+        # Wilson score interval for the QBER seen so far
+        if not self.samples:
+            return 0.0, 1.0
+        z = NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+        return self._wilson(z)
+
+    def lower_bound(self):
+        # One-sided Wilson lower bound at confidence 1 - alpha
+        if not self.samples:
+            return 0.0
+        return self._wilson(NormalDist().inv_cdf(1 - self.alpha))[0]
+
+    def _wilson(self, z):
+        n, p = self.samples, self.qber()
+        centre = (p + z * z / (2 * n)) / (1 + z * z / n)
+        half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+        return max(0.0, centre - half), min(1.0, centre + half)
+
+    def report(self):
+        low, high = self.bounds()
+        return (f"running QBER {self.qber():.4f} over {self.samples} samples "
+                f"(95% CI {low:.4f}-{high:.4f}, lower bound {self.lower_bound():.4f}/{self.threshold})")
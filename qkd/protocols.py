@@ -0,0 +1,212 @@
+import argparse
+import math
+import time
+
+import numpy as np
+
+from qkd import kernel
+from qkd.channel import Channel, Depolarizing, InterceptResend
+from qkd.entropy import binary_entropy
+
+# QKD protocols on the shared batched kernel.
+#
+# Each protocol only decides which states Alice prepares (or, for E91, which
+# state Bob's half is steered into by Alice's measurement) and which axes Bob
+# measures. Channel stages, measurement, sifting and error estimation are the
+# same code path for all of them, so key rates are directly comparable.
+
+F_EC = 1.16  # error-correction inefficiency used in the key-rate formulas
+
+
+class ProtocolRun:
+    def __init__(self, name, sent, alice_key, bob_key, chsh=None):
+        self.name = name
+        self.sent = sent
+        self.alice_key = alice_key
+        self.bob_key = bob_key
+        self.chsh = chsh
+
+
+class Protocol:
+    name = None
+
+    def exchange(self, n, channel, rng):
+        # Returns (alice_bits, bob_bits, keep, chsh) where keep marks the sifted
+        # rounds and chsh is the Bell test value (None without entanglement)
+        raise NotImplementedError
+
+    def secret_fraction(self, qber, run):
+        raise NotImplementedError
+
+    def run(self, n, channel=None, rng=None):
+        channel = channel or Channel()
+        rng = rng or np.random.default_rng()
+        alice_bits, bob_bits, keep, s = self.exchange(n, channel, rng)
+        keep = keep & (bob_bits != kernel.NO_CLICK)
+        return ProtocolRun(self.name, n, alice_bits[keep], bob_bits[keep], s)
+
+
+class BB84(Protocol):
+    name = 'bb84'
+    bases = (kernel.Z, kernel.X)
+
+    def exchange(self, n, channel, rng):
+        bases = np.asarray(self.bases)
+        alice_bits = rng.integers(2, size=n, dtype=np.int8)
+        alice_bases = bases[rng.integers(len(bases), size=n)]
+        bob_bases = bases[rng.integers(len(bases), size=n)]
+        batch = channel(kernel.prepare(alice_bits, alice_bases), rng)
+        bob_bits = kernel.measure(batch, bob_bases, rng)
+        return alice_bits, bob_bits, alice_bases == bob_bases, None
+
+    def secret_fraction(self, qber, run):
+        # Shor-Preskill
+        return 1 - binary_entropy(qber) - F_EC * binary_entropy(qber)
+
+
+class SixState(BB84):
+    name = 'six_state'
+    bases = (kernel.Z, kernel.X, kernel.Y)
+
+    def secret_fraction(self, qber, run):
+        # One-way six-state bound (Lo 2001): Eve's information is limited by
+        # the full Pauli error distribution {1 - 3Q/2, Q/2, Q/2, Q/2}
+        q = min(qber, 2 / 3)
+        probs = np.array([1 - 1.5 * q, q / 2, q / 2, q / 2])
+        probs = probs[probs > 0]
+        return 1 + float(np.sum(probs * np.log2(probs))) + binary_entropy(q) - F_EC * binary_entropy(q)
+
+
+class B92(Protocol):
+    # Bit 0 -> |0>, bit 1 -> |+>. Bob measures Z or X at random; outcome 1 is
+    # conclusive (|1> excludes |0>, |-> excludes |+>).
+    name = 'b92'
+
+    def exchange(self, n, channel, rng):
+        alice_bits = rng.integers(2, size=n, dtype=np.int8)
+        alice_bases = alice_bits  # bit 0 -> Z basis, bit 1 -> X basis, always value 0
+        bob_bases = rng.integers(2, size=n, dtype=np.int8)
+        batch = channel(kernel.prepare(np.zeros(n, dtype=np.int8), alice_bases), rng)
+        outcomes = kernel.measure(batch, bob_bases, rng)
+        conclusive = outcomes == 1
+        bob_bits = np.where(outcomes == kernel.NO_CLICK, kernel.NO_CLICK, 1 - bob_bases).astype(np.int8)
+        return alice_bits, bob_bits, conclusive, None
+
+    def secret_fraction(self, qber, run):
+        # No tight closed form for B92; use the BB84 expression as an estimate
+        return 1 - binary_entropy(qber) - F_EC * binary_entropy(qber)
+
+
+class E91(Protocol):
+    # Singlet pairs. Alice measures at 0, pi/4, pi/2 and Bob at pi/4, pi/2,
+    # 3pi/4 (angles on the X-Z great circle). Equal angles give
+    # anti-correlated key bits; (0 | pi/2) x (pi/4 | 3pi/4) feed the CHSH test.
+    name = 'e91'
+    alice_angles = np.array([0.0, np.pi / 4, np.pi / 2])
+    bob_angles = np.array([np.pi / 4, np.pi / 2, 3 * np.pi / 4])
+
+    def exchange(self, n, channel, rng):
+        a_set = rng.integers(3, size=n)
+        b_set = rng.integers(3, size=n)
+        a_axes = kernel.axis_in_xz(self.alice_angles[a_set])
+        b_axes = kernel.axis_in_xz(self.bob_angles[b_set])
+        # Alice's outcome on a singlet is uniform and steers Bob's half into
+        # the opposite state along her axis; operations on Bob's half commute
+        # with her measurement, so the channel can act afterwards.
+        alice_bits = rng.integers(2, size=n, dtype=np.int8)
+        batch = channel(kernel.prepare_on_axes(1 - alice_bits, a_axes), rng)
+        bob_out = kernel.measure_on_axes(batch, b_axes, rng)
+
+        key = ((a_set == 1) & (b_set == 0)) | ((a_set == 2) & (b_set == 1))
+        bob_bits = np.where(bob_out == kernel.NO_CLICK, kernel.NO_CLICK, 1 - bob_out).astype(np.int8)
+        return alice_bits, bob_bits, key, chsh(a_set, b_set, alice_bits, bob_out)
+
+    def secret_fraction(self, qber, run):
+        # Device-independent bound (Acin et al. 2007) from the CHSH value
+        s = min(abs(run.chsh), 2 * math.sqrt(2))
+        if s <= 2:
+            return 0.0
+        return 1 - F_EC * binary_entropy(qber) - binary_entropy((1 + math.sqrt((s / 2) ** 2 - 1)) / 2)
+
+
+def correlation(alice_bits, bob_bits):
+    # <(-1)^(a xor b)> over the given rounds
+    if len(alice_bits) == 0:
+        return 0.0
+    return float(np.mean(1 - 2 * (alice_bits ^ bob_bits)))
+
+
+def chsh(a_set, b_set, alice_bits, bob_bits):
+    # S = E(a0,b0) - E(a0,b2) + E(a2,b0) + E(a2,b2) from the batched rounds
+    valid = bob_bits != kernel.NO_CLICK
+    terms = [(0, 0, 1), (0, 2, -1), (2, 0, 1), (2, 2, 1)]
+    s = 0.0
+    for a, b, sign in terms:
+        rounds = valid & (a_set == a) & (b_set == b)
+        s += sign * correlation(alice_bits[rounds], bob_bits[rounds])
+    return s
+
+
+PROTOCOLS = {p.name: p for p in (BB84(), SixState(), B92(), E91())}
+
+
+# Protocols alice.py/bob.py can run, with their basis alphabets; decoy is
+# BB84 with a weak coherent source. B92 and E91 only run in this module.
+SCRIPT_BASES = {'bb84': BB84.bases, 'six_state': SixState.bases, 'decoy': BB84.bases}
+
+
+def script_bases(name):
+    # Basis alphabet used by alice.py/bob.py for a prepare-and-measure protocol
+    if name not in SCRIPT_BASES:
+        raise ValueError(f"protocol={name!r} cannot run between the scripts "
+                         f"(choose from {', '.join(SCRIPT_BASES)})")
+    return SCRIPT_BASES[name]
+
+
+def estimate(run, protocol, sample_fraction=0.1, rng=None):
+    # Shared sifting/estimation pipeline: reveal a random sample of the sifted
+    # key, estimate the QBER on it and keep the rest.
+    rng = rng or np.random.default_rng()
+    sifted = len(run.alice_key)
+    k = int(round(sifted * sample_fraction))
+    sample = rng.choice(sifted, size=k, replace=False) if k else np.array([], dtype=int)
+    errors = int(np.count_nonzero(run.alice_key[sample] != run.bob_key[sample]))
+    qber = errors / k if k else 0.0
+    fraction = max(protocol.secret_fraction(qber, run), 0.0)
+    key_bits = sifted - k
+    return {
+        'protocol': run.name,
+        'sent': run.sent,
+        'sifted': sifted,
+        'sample': k,
+        'qber': qber,
+        'secret_fraction': fraction,
+        'secure_bits': int(key_bits * fraction),
+        'key_rate': key_bits * fraction / max(run.sent, 1),
+        'chsh': run.chsh,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare QKD protocols on the batched kernel")
+    parser.add_argument('--qubits', type=int, default=1_000_000)
+    parser.add_argument('--depolarizing', type=float, default=0.0)
+    parser.add_argument('--eve', type=float, default=0.0)
+    parser.add_argument('--sample-fraction', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    channel = Channel(InterceptResend(args.eve), Depolarizing(args.depolarizing))
+    print(f"{'protocol':>10} {'sifted':>9} {'QBER':>7} {'CHSH':>6} {'rate':>9} {'time':>7}")
+    for name, protocol in PROTOCOLS.items():
+        start = time.perf_counter()
+        run = protocol.run(args.qubits, channel, rng)
+        est = estimate(run, protocol, args.sample_fraction, rng)
+        chsh_text = f"{abs(est['chsh']):6.3f}" if est['chsh'] is not None else f"{'-':>6}"
+        print(f"{name:>10} {est['sifted']:9d} {est['qber']:7.4f} {chsh_text} "
+              f"{est['key_rate']:9.5f} {time.perf_counter() - start:6.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+import argparse
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+# Randomness for key material: Alice's bits and bases, Bob's bases and the
+# error-estimation samples.
+#
+# OsRandom pulls large blocks from os.urandom on a background thread (two
+# blocks buffered ahead) and unpacks them into bit / basis arrays with NumPy,
+# so drawing a million bases costs one slice and an unpackbits. SeededRandom
+# offers the same calls on a seeded PCG64 generator for reproducible tests;
+# it is not a key source. The channel and measurement simulation keep their
+# own numpy Generator (generator()). Alice and Bob read the same seed from
+# the config, so every seeded stream also folds in the role: with one shared
+# stream Bob's basis draws would replay Alice's bit draws.
+
+CHUNK_BYTES = 1 << 20
+BUFFERED_CHUNKS = 2
+ROLES = ("alice", "bob")
+
+
+class OsRandom:
+    def __init__(self, chunk_bytes=CHUNK_BYTES):
+        self.chunk_bytes = chunk_bytes
+        self.chunks = queue.Queue(maxsize=BUFFERED_CHUNKS)
+        self.buffer = np.empty(0, dtype=np.uint8)
+        self.pos = 0
+        self.lock = threading.Lock()
+        self.refill = threading.Thread(target=self._refill, daemon=True)
+        self.refill.start()
+
+    def _refill(self):
+        while True:
+            self.chunks.put(np.frombuffer(os.urandom(self.chunk_bytes), dtype=np.uint8))
+
+    def bytes(self, count):
+        # uint8 array of `count` random bytes
+        parts = []
+        with self.lock:
+            while count > 0:
+                if self.pos == len(self.buffer):
+                    self.buffer = self.chunks.get()
+                    self.pos = 0
+                take = min(count, len(self.buffer) - self.pos)
+                parts.append(self.buffer[self.pos:self.pos + take])
+                self.pos += take
+                count -= take
+        if not parts:
+            return np.empty(0, dtype=np.uint8)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def bits(self, n):
+        return np.unpackbits(self.bytes((n + 7) // 8))[:n]
+
+    def state(self):
+        # OS randomness has no position to save or restore
+        return None
+
+    def restore(self, state):
+        pass
+
+    def integers(self, k, n):
+        # n uniform values in [0, k) for small k (basis choices)
+        if k == 2:
+            return self.bits(n)
+        mask = (1 << int(k - 1).bit_length()) - 1
+        out = np.empty(0, dtype=np.uint8)
+        while len(out) < n:
+            # One byte per draw, masked to the next power of two; rejecting
+            # values >= k keeps the choice unbiased
+            need = n - len(out)
+            values = self.bytes(int(need * (mask + 1) / k) + 64) & mask
+            out = np.concatenate([out, values[values < k][:need]])
+        return out
+
+    def sample(self, population, k):
+        # k distinct indices from range(population): the k smallest of
+        # uniform 64-bit keys
+        if k >= population:
+            keys = self.bytes(8 * population).view(np.uint64)
+            return [int(i) for i in np.argsort(keys)]
+        keys = self.bytes(8 * population).view(np.uint64)
+        return [int(i) for i in np.argpartition(keys, k - 1)[:k]]
+
+
+def _seed_sequence(seed, stream, role):
+    return np.random.SeedSequence([seed, stream, ROLES.index(role)])
+
+
+class SeededRandom:
+    def __init__(self, seed, role="alice"):
+        # Kept apart from the simulation stream seeded with the same value
+        self.rng = np.random.default_rng(_seed_sequence(seed, 1, role))
+
+    def bytes(self, count):
+        return self.rng.integers(0, 256, size=count, dtype=np.uint8)
+
+    def bits(self, n):
+        return self.rng.integers(0, 2, size=n, dtype=np.uint8)
+
+    def state(self):
+        return self.rng.bit_generator.state
+
+    def restore(self, state):
+        self.rng.bit_generator.state = state
+
+    def integers(self, k, n):
+        return self.rng.integers(0, k, size=n, dtype=np.uint8)
+
+    def sample(self, population, k):
+        return [int(i) for i in self.rng.choice(population, size=min(k, population), replace=False)]
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def generator(seed, role):
+    # numpy Generator for one role's simulation (photon source, channel,
+    # measurement); unseeded when seed is None
+    return np.random.default_rng(None if seed is None else _seed_sequence(seed, 0, role))
+
+
+def source(seed=None, role="alice"):
+    # seed=None (the default in qkd_config.txt) draws key material from the
+    # OS. Every caller in a process shares one OsRandom, so in-process
+    # sessions do not each pay for a refill thread and its first chunks.
+    global _shared
+    if seed is not None:
+        return SeededRandom(seed, role)
+    with _shared_lock:
+        if _shared is None:
+            _shared = OsRandom()
+    return _shared
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of the key-material random sources")
+    parser.add_argument('--qubits', type=int, default=10_000_000)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    rand = source(args.seed)
+    for name, draw in (("bits", lambda: rand.bits(args.qubits)),
+                       ("bases (2)", lambda: rand.integers(2, args.qubits)),
+                       ("bases (3)", lambda: rand.integers(3, args.qubits))):
+        start = time.perf_counter()
+        values = draw()
+        seconds = time.perf_counter() - start
+        print(f"{name:>10}: {len(values)} values in {seconds:.3f} s ({len(values) / seconds / 1e6:.1f} M/s)")
+
+
+if __name__ == '__main__':
+    main()
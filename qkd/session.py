@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+import time
+
+from qkd import links
+from qkd.config import DEFAULT_CONFIG_PATH, load_config, parse_value
+
+# Per-run session parameters and port rendezvous, so several alice.py/bob.py
+# pairs can run on one host at the same time.
+#
+# Settings are layered, later ones winning: the script defaults, the
+# key=value config file (--config or QKD_CONFIG), a JSON session descriptor
+# (--session or QKD_SESSION), QKD_<KEY> environment variables and finally
+# --set key=value arguments. port=0 lets the OS pick a free port; Alice then
+# publishes her link address in the rendezvous file and Bob waits for it.
+
+DEFAULT_PORT = 65432
+ENV_PREFIX = "QKD_"
+RESERVED_ENV = ("QKD_CONFIG", "QKD_SESSION")
+
+
+def parse_args(argv=None, description=None):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--config', default=os.environ.get("QKD_CONFIG", DEFAULT_CONFIG_PATH),
+                        help="key=value config file")
+    parser.add_argument('--session', default=os.environ.get("QKD_SESSION"), help="JSON session descriptor")
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE', help="override one setting")
+    parser.add_argument('--port', type=int, help="0 picks a free port (use with --rendezvous)")
+    parser.add_argument('--rendezvous', help="file where Alice publishes her address")
+    return parser.parse_args(argv)
+
+
+def load(argv=None, defaults=None, environ=None, description=None):
+    args = parse_args(argv, description)
+    environ = os.environ if environ is None else environ
+    config = load_config(args.config, defaults)
+    if args.session:
+        with open(args.session) as f:
+            config.update(json.load(f))
+    for key, value in environ.items():
+        if key.startswith(ENV_PREFIX) and key not in RESERVED_ENV:
+            config[key[len(ENV_PREFIX):].lower()] = parse_value(value)
+    for item in args.set:
+        key, value = item.split("=", 1)
+        config[key.strip()] = parse_value(value.strip())
+    if args.port is not None:
+        config["port"] = args.port
+    if args.rendezvous:
+        config["rendezvous"] = args.rendezvous
+    return config
+
+
+def output_dir(config, script_dir):
+    # Where a session writes its key file and checkpoint
+    path = config.get("output_dir", script_dir)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def publish(path, address):
+    # Atomic write, so Bob never reads half a file
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"address": address, "pid": os.getpid()}, f)
+    os.replace(tmp, path)
+
+
+def withdraw(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def wait_for(path, timeout=30.0, interval=0.05):
+    # Link address from the rendezvous file once Alice has published it
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with open(path) as f:
+                address = json.load(f)
+            return address["address"]
+        except (FileNotFoundError, ValueError):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"no QKD peer published {path} within {timeout} s")
+            time.sleep(interval)
+
+
+def address(config, host, port=DEFAULT_PORT):
+    # Where Bob connects: the rendezvous file if there is one, else link_qkd
+    # or the configured TCP port
+    if config.get("rendezvous"):
+        return wait_for(config["rendezvous"], config.get("rendezvous_timeout", 30.0))
+    return links.address(config, "qkd", config.get("port", port), host)
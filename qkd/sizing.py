@@ -0,0 +1,62 @@
+import math
+from statistics import NormalDist
+
+from qkd.entropy import binary_entropy
+
+# Sizing a QKD run for a requested number of secure key bits.
+#
+# About half of the raw qubits survive sifting (a third for six-state, far
+# fewer with loss), error_bits more are spent on sampling, and error
+# correction plus privacy amplification consume a QBER-dependent fraction
+# of what is left. These helpers invert that chain so the caller can ask
+# for N key bits instead of guessing num_bits.
+
+F_EC = 1.16  # error-correction inefficiency
+DEFAULT_CONFIDENCE = 0.99
+
+
+def expected_sift_ratio(config):
+    # Probability that one raw qubit ends up in the sifted key
+    protocol = config.get('protocol', 'bb84')
+    basis_match = 1 / 3 if protocol == 'six_state' else 1 / 2
+    eta = config.get('transmittance', 1.0) * config.get('detector_efficiency', 1.0)
+    dark = config.get('dark_count', 0.0)
+    if protocol == 'decoy':
+        # Only signal pulses are kept; a pulse clicks unless all its photons are lost
+        mu = config.get('mu', 0.5)
+        detect = config.get('p_mu', 0.8) * (1 - (1 - dark) * math.exp(-mu * eta))
+    else:
+        detect = 1 - (1 - eta) * (1 - dark)
+    return basis_match * detect
+
+
+def secret_fraction(qber, f_ec=F_EC):
+    # Share of the unsampled key left after reconciliation leakage (f h(Q))
+    # and privacy amplification (h(Q))
+    return max(0.0, 1 - binary_entropy(qber) - f_ec * binary_entropy(qber))
+
+
+def secure_length(unsampled_bits, qber, f_ec=F_EC):
+    return int(math.floor(unsampled_bits * secret_fraction(qber, f_ec)))
+
+
+def raw_qubits_for(target_bits, error_bits, sift_ratio, expected_qber=0.0,
+                   confidence=DEFAULT_CONFIDENCE, f_ec=F_EC):
+    # Smallest raw block whose sifted length reaches the required size with
+    # the given confidence (normal approximation to the binomial)
+    keep = secret_fraction(expected_qber, f_ec)
+    if keep <= 0 or sift_ratio <= 0:
+        raise ValueError("no secure key can be distilled at this QBER / sift ratio")
+    needed = math.ceil(target_bits / keep) + error_bits
+    p = sift_ratio
+    z = NormalDist().inv_cdf(confidence)
+    # Solve n p - z sqrt(n p (1 - p)) = needed for sqrt(n)
+    b = z * math.sqrt(p * (1 - p))
+    root = (b + math.sqrt(b * b + 4 * p * needed)) / (2 * p)
+    return math.ceil(root * root)
+
+
+def expected_key_bits(raw_qubits, error_bits, sift_ratio, expected_qber=0.0, f_ec=F_EC):
+    # Mean key length a block of raw_qubits yields; used to decide whether
+    # the blocks already in flight will cover the target
+    return secure_length(max(0.0, raw_qubits * sift_ratio - error_bits), expected_qber, f_ec)
@@ -0,0 +1,171 @@
+import numpy as np
+
+# Stabilizer tableau simulator (Aaronson & Gottesman, "Improved simulation of
+# stabilizer circuits", PRA 70, 052328, 2004).
+#
+# An n-qubit stabilizer state is stored as 2n Pauli rows (n destabilizers,
+# n stabilizers) in bit-packed x/z matrices plus a sign bit per row, so
+# memory is O(n^2) bits and each gate is O(n) instead of the O(2^n) state vector that
+# cirq.Simulator needs once qubits are entangled. Only Clifford gates are
+# supported, which covers everything the QKD circuits use (X, Y, Z, H, S,
+# CNOT and Z-basis measurement).
+
+
+if hasattr(np, 'bitwise_count'):
+    def _popcount(words):
+        return np.bitwise_count(words)
+else:
+    _BYTE_COUNTS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words):
+        return _BYTE_COUNTS[words.view(np.uint8)].reshape(*words.shape, 8).sum(axis=-1)
+
+
+def _phase_sum(x1, z1, x2, z2):
+    # Sum over qubits of the i-exponent picked up by (x1,z1)*(x2,z2), i.e.
+    # the +1/-1 cases of the CHP g() function counted with popcounts
+    pos = (x1 & z1 & ~x2 & z2) | (x1 & ~z1 & x2 & z2) | (~x1 & z1 & x2 & ~z2)
+    neg = (x1 & z1 & x2 & ~z2) | (x1 & ~z1 & ~x2 & z2) | (~x1 & z1 & x2 & z2)
+    return _popcount(pos).sum(axis=-1, dtype=np.int64) - _popcount(neg).sum(axis=-1, dtype=np.int64)
+
+
+class StabilizerState:
+    def __init__(self, num_qubits, rng=None):
+        n = num_qubits
+        self.n = n
+        self.rng = rng or np.random.default_rng()
+        # Pauli rows are bit-packed 64 qubits per word
+        words = (n + 63) // 64
+        self.x = np.zeros((2 * n, words), dtype=np.uint64)
+        self.z = np.zeros((2 * n, words), dtype=np.uint64)
+        self.r = np.zeros(2 * n, dtype=bool)
+        for q in range(n):
+            w, m = self._bit(q)
+            self.x[q, w] |= m
+            self.z[n + q, w] |= m
+
+    @staticmethod
+    def _bit(q):
+        return q >> 6, np.uint64(1 << (q & 63))
+
+    def _column(self, table, q):
+        w, m = self._bit(q)
+        return (table[:, w] & m) != 0
+
+    def _set_column(self, table, q, values):
+        w, m = self._bit(q)
+        table[:, w] = (table[:, w] & ~m) | np.where(values, m, np.uint64(0))
+
+    # Clifford gates act on whole tableau columns
+
+    def h(self, a):
+        xa, za = self._column(self.x, a), self._column(self.z, a)
+        self.r ^= xa & za
+        self._set_column(self.x, a, za)
+        self._set_column(self.z, a, xa)
+
+    def s(self, a):
+        xa, za = self._column(self.x, a), self._column(self.z, a)
+        self.r ^= xa & za
+        self._set_column(self.z, a, za ^ xa)
+
+    def cnot(self, a, b):
+        xa, za = self._column(self.x, a), self._column(self.z, a)
+        xb, zb = self._column(self.x, b), self._column(self.z, b)
+        self.r ^= xa & zb & ~(xb ^ za)
+        self._set_column(self.x, b, xb ^ xa)
+        self._set_column(self.z, a, za ^ zb)
+
+    def pauli_x(self, a):
+        self.r ^= self._column(self.z, a)
+
+    def pauli_z(self, a):
+        self.r ^= self._column(self.x, a)
+
+    def pauli_y(self, a):
+        self.r ^= self._column(self.x, a) ^ self._column(self.z, a)
+
+    def _rowsum(self, rows, p):
+        # Multiply each of the Pauli rows `rows` by row p, all at once
+        g = _phase_sum(self.x[p], self.z[p], self.x[rows], self.z[rows])
+        phase = 2 * self.r[rows].astype(np.int64) + 2 * int(self.r[p]) + g
+        self.r[rows] = (phase % 4) == 2
+        self.x[rows] ^= self.x[p]
+        self.z[rows] ^= self.z[p]
+
+    def _product_sign(self, rows):
+        # Sign of the ordered product of the Pauli rows. The running product
+        # before each factor is a prefix XOR, so the phase of the whole chain
+        # is one vectorized sum instead of a loop of rowsums.
+        xs, zs = self.x[rows], self.z[rows]
+        acc_x = np.bitwise_xor.accumulate(xs, axis=0)
+        acc_z = np.bitwise_xor.accumulate(zs, axis=0)
+        g = _phase_sum(xs[1:], zs[1:], acc_x[:-1], acc_z[:-1]).sum()
+        phase = 2 * int(np.count_nonzero(self.r[rows])) + int(g)
+        return (phase % 4) == 2
+
+    def measure(self, a):
+        n = self.n
+        hits = self._column(self.x, a)
+        stab_hits = np.flatnonzero(hits[n:])
+        if len(stab_hits):
+            # Random outcome: some stabilizer anticommutes with Z_a
+            p = n + stab_hits[0]
+            rows = np.flatnonzero(hits)
+            rows = rows[rows != p]
+            if len(rows):
+                self._rowsum(rows, p)
+            self.x[p - n], self.z[p - n], self.r[p - n] = self.x[p], self.z[p], self.r[p]
+            w, m = self._bit(a)
+            self.x[p] = 0
+            self.z[p] = 0
+            self.z[p, w] = m
+            self.r[p] = bool(self.rng.integers(2))
+            return int(self.r[p])
+        # Deterministic outcome: the product of the stabilizers paired with
+        # the destabilizers that anticommute with Z_a is +-Z_a
+        rows = np.flatnonzero(hits[:n]) + n
+        return int(self._product_sign(rows))
+
+
+class TableauResult:
+    # Mirrors the part of cirq.Result that the scripts use
+    def __init__(self, measurements):
+        self.measurements = measurements
+
+
+class StabilizerSimulator:
+    # Drop-in for cirq.Simulator().run() on Clifford circuits
+    def __init__(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+
+    def run(self, circuit, repetitions=1):
+        import cirq
+
+        qubits = sorted(circuit.all_qubits())
+        index = {q: i for i, q in enumerate(qubits)}
+        records = {}
+        for _ in range(repetitions):
+            state = StabilizerState(len(qubits), self.rng)
+            shot = {}
+            for op in circuit.all_operations():
+                targets = [index[q] for q in op.qubits]
+                if cirq.is_measurement(op):
+                    shot[cirq.measurement_key_name(op)] = [state.measure(t) for t in targets]
+                elif op.gate == cirq.H:
+                    state.h(targets[0])
+                elif op.gate == cirq.X:
+                    state.pauli_x(targets[0])
+                elif op.gate == cirq.Y:
+                    state.pauli_y(targets[0])
+                elif op.gate == cirq.Z:
+                    state.pauli_z(targets[0])
+                elif op.gate == cirq.S:
+                    state.s(targets[0])
+                elif op.gate == cirq.CNOT:
+                    state.cnot(targets[0], targets[1])
+                else:
+                    raise ValueError(f"Stabilizer backend does not support {op!r}")
+            for key, bits in shot.items():
+                records.setdefault(key, []).append(bits)
+        return TableauResult({key: np.array(rows, dtype=np.int8) for key, rows in records.items()})
@@ -0,0 +1,114 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Cold-start benchmark for the scripts the GUIs spawn.
+#
+# Every script is loaded in a fresh interpreter without running its
+# __main__ block, which is the fixed cost each launch pays before doing
+# any work. --session also times a whole launch the way the GUI does it:
+# from starting alice.py and bob.py to Bob having measured the first
+# block. The exit status is 1 when any script's median cold start is over
+# --budget, so the budget can be checked by CI or before a release.
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SCRIPTS = {
+    "alice": "Alice/alice.py",
+    "bob": "Bob/bob.py",
+    "classical_alice": "Alice/classical_alice.py",
+    "classical_bob": "Bob/classical_bob.py",
+    "mitm": "MITM/classical_mitm.py",
+}
+BUDGET = 0.5  # seconds per script
+PROBE = "import runpy, sys; sys.argv = sys.argv[1:]; runpy.run_path(sys.argv[0], run_name='qkd_startup')"
+
+
+def cold_start(script, runs=5):
+    # Wall-clock seconds to start an interpreter and load `script`, one per run
+    path = os.path.join(ROOT, script)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", PROBE, path], cwd=os.path.dirname(path),
+                       check=True, capture_output=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def slowest_imports(script, top=5):
+    # (seconds, module) of the costliest top-level imports, from -X importtime
+    path = os.path.join(ROOT, script)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE, path],
+                            cwd=os.path.dirname(path), check=True, capture_output=True, text=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # runpy and what it imports belong to the probe, not the script
+        if len(name) - len(name.lstrip()) == 1 and name.strip() not in ("runpy", "pkgutil"):
+            imports.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def first_block(timeout=60.0):
+    # Seconds from launching alice.py and bob.py until Bob has measured the first block
+    with tempfile.TemporaryDirectory() as tmp:
+        rendezvous = os.path.join(tmp, "rendezvous.json")
+        common = ["--set", "num_bits=10", "--set", "error_bits=1", "--rendezvous", rendezvous]
+        start = time.perf_counter()
+        alice = subprocess.Popen([sys.executable, "-u", "alice.py", "--port", "0", "--set",
+                                  f"output_dir={tmp}/alice"] + common,
+                                 cwd=os.path.join(ROOT, "Alice"), stdout=subprocess.DEVNULL)
+        bob = subprocess.Popen([sys.executable, "-u", "bob.py", "--set", f"output_dir={tmp}/bob"] + common,
+                               cwd=os.path.join(ROOT, "Bob"), stdout=subprocess.PIPE, text=True)
+        seconds = None
+        try:
+            for line in bob.stdout:
+                if "Bases sent" in line:
+                    seconds = time.perf_counter() - start
+                    break
+            bob.stdout.read()
+            bob.wait(timeout)
+            alice.wait(timeout)
+        finally:
+            for proc in (alice, bob):
+                if proc.poll() is None:
+                    proc.kill()
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start times of the QKD scripts against a budget")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=BUDGET, help="seconds allowed per script (median)")
+    parser.add_argument('--top', type=int, default=0, help="also list each script's N slowest imports")
+    parser.add_argument('--session', action='store_true', help="also time launch to first measured block")
+    args = parser.parse_args()
+
+    over = []
+    print(f"{'script':>16} {'median':>8} {'min':>8}   budget {args.budget:.3f} s")
+    for name, script in SCRIPTS.items():
+        times = cold_start(script, args.runs)
+        median = statistics.median(times)
+        flag = "" if median <= args.budget else "  OVER BUDGET"
+        print(f"{name:>16} {median:8.3f} {min(times):8.3f}{flag}")
+        if flag:
+            over.append(name)
+        for seconds, module in slowest_imports(script, args.top) if args.top else ():
+            print(f"{'':>18}{seconds:8.3f}  {module}")
+    if args.session:
+        seconds = first_block()
+        print(f"Launch to first measured block: {seconds:.3f} s" if seconds is not None
+              else "Launch to first measured block: Bob never measured a block")
+    if over:
+        print(f"Over budget: {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
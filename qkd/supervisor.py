@@ -0,0 +1,170 @@
+import subprocess
+import sys
+import threading
+import time
+
+from qkd import links
+
+# Process supervision for the GUIs (and anything else that runs the scripts).
+#
+# Children are tracked by name and pid, so replacing or stopping one no
+# longer means scanning the process table for a matching command line.
+# Starting a child under a name already in use stops the old one first
+# and waits for it to exit, which also frees its port. A child counts as
+# ready when it prints `ready_line`, or when `ready_link` accepts a
+# connection (a probe that connects and hangs up straight away). Each
+# start, ready, restart and exit is reported to on_event(name, event,
+# detail) from a background thread, and is also available as threading
+# Events on the Child. restart="on-failure" starts a child again after a
+# non-zero exit, backing off between attempts.
+
+READY_TIMEOUT = 10.0
+PROBE_INTERVAL = 0.01
+BACKOFF = 0.2
+STOP_TIMEOUT = 1.0
+
+
+class Child:
+    def __init__(self, supervisor, name, cmd, cwd, ready_line, ready_link, restart, retries):
+        self.supervisor = supervisor
+        self.name = name
+        self.cmd = cmd
+        self.cwd = cwd
+        self.ready_line = ready_line
+        self.ready_link = ready_link
+        self.restart = restart
+        self.retries = retries
+        self.attempt = 0
+        self.proc = None
+        self.stopped = False
+        self.returncode = None
+        self.ready = threading.Event()
+        self.done = threading.Event()
+
+    @property
+    def pid(self):
+        return self.proc.pid if self.proc else None
+
+    def _spawn(self):
+        pool = self.supervisor.pool
+        if pool:
+            self.proc = pool.take(self.cmd, self.cwd)
+        else:
+            self.proc = subprocess.Popen(self.cmd, cwd=self.cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                         stderr=subprocess.STDOUT, text=True, bufsize=1)
+        self.ready.clear()
+        self.supervisor._event(self, "started", self.proc.pid)
+        if self.ready_link:
+            threading.Thread(target=self._probe, args=(self.proc,), daemon=True).start()
+        elif not self.ready_line:
+            self._set_ready()
+
+    def _set_ready(self):
+        if not self.ready.is_set():
+            self.ready.set()
+            self.supervisor._event(self, "ready", self.proc.pid)
+
+    def _probe(self, proc):
+        deadline = time.monotonic() + READY_TIMEOUT
+        while proc is self.proc and proc.poll() is None and not self.stopped:
+            try:
+                peer = links.connect(self.ready_link, timeout=PROBE_INTERVAL)
+            except OSError:
+                if time.monotonic() > deadline:
+                    self.supervisor._event(self, "timeout", self.ready_link)
+                    return
+                time.sleep(PROBE_INTERVAL)
+                continue
+            peer.close()
+            self._set_ready()
+            return
+
+    def lines(self):
+        # The child's output, line by line, across restarts; the reader also
+        # spots ready_line and reports the exit
+        while True:
+            proc = self.proc
+            for line in proc.stdout:
+                line = line.rstrip()
+                if self.ready_line and self.ready_line in line:
+                    self._set_ready()
+                yield line
+            code = proc.wait()
+            proc.stdout.close()
+            if (code != 0 and not self.stopped and self.restart == "on-failure"
+                    and self.attempt < self.retries):
+                self.attempt += 1
+                self.supervisor._event(self, "restarting", code)
+                time.sleep(BACKOFF * 2 ** (self.attempt - 1))
+                if not self.stopped:
+                    self._spawn()
+                    continue
+            self.returncode = code
+            self.supervisor._event(self, "exited", code)
+            self.done.set()
+            return
+
+    def send(self, text):
+        try:
+            self.proc.stdin.write(text + "\n")
+            self.proc.stdin.flush()
+        except (OSError, ValueError):
+            pass
+
+    def stop(self):
+        # Terminate and wait, so the child's ports are free on return
+        self.stopped = True
+        self.supervisor._forget(self)
+        proc = self.proc
+        if proc and proc.poll() is None:
+            proc.terminate()
+            try:
+                proc.wait(STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+
+
+class Supervisor:
+    def __init__(self, pool=None, on_event=None):
+        self.pool = pool
+        self.on_event = on_event
+        self.children = {}
+        self.lock = threading.Lock()
+
+    def start(self, name, cmd, cwd=None, ready_line=None, ready_link=None, restart="never", retries=3):
+        # Start `cmd` as `name`, replacing a child already running under it
+        self.stop(name)
+        child = Child(self, name, cmd, cwd, ready_line, ready_link, restart, retries)
+        with self.lock:
+            self.children[name] = child
+        child._spawn()
+        return child
+
+    def get(self, name):
+        return self.children.get(name)
+
+    def stop(self, name):
+        child = self.children.get(name)
+        if child:
+            child.stop()
+
+    def stop_all(self):
+        for name in list(self.children):
+            self.stop(name)
+
+    def _forget(self, child):
+        with self.lock:
+            if self.children.get(child.name) is child:
+                del self.children[child.name]
+
+    def pids(self):
+        return {name: child.pid for name, child in list(self.children.items())}
+
+    def _event(self, child, event, detail=None):
+        # Children that were stopped or replaced are not reported any more
+        if self.on_event and self.children.get(child.name) is child:
+            try:
+                self.on_event(child.name, event, detail)
+            except Exception as e:
+                print(f"Supervisor: {event} handler for {child.name} failed: {e}", file=sys.stderr)
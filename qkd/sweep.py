@@ -0,0 +1,145 @@
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from qkd.channel import Channel, Depolarizing, InterceptResend
+from qkd.trials import run_trials
+
+# Parallel parameter sweeps over the trial engine.
+#
+# Grid points are spread over a process pool whose workers stay alive for
+# the whole sweep (NumPy and the engine are imported once per worker). Each
+# finished point is appended to a CSV file straight away, and that file is
+# also the checkpoint: re-running a sweep into the same file skips every
+# parameter combination already in it with the same trial count and seed.
+# A row cut short by an interrupted write is dropped and its point re-run. When pyarrow is installed the
+# complete table is also written as Parquet at the end.
+
+PARAMS = ('num_bits', 'error_bits', 'threshold', 'depolarizing', 'eve_fraction')
+METRICS = ('trials', 'sifted_mean', 'sifted_p5', 'sifted_p95', 'qber_est_mean', 'qber_true_mean',
+           'abort_rate', 'abort_short_rate', 'abort_qber_rate', 'key_length_mean', 'key_length_p5')
+COLUMNS = ('point',) + PARAMS + ('seed',) + METRICS + ('seconds',)
+
+
+def grid(**axes):
+    # Cartesian product of the parameter lists, in PARAMS order
+    values = [axes[name] for name in PARAMS]
+    return [dict(zip(PARAMS, combo)) for combo in itertools.product(*values)]
+
+
+def _warm_worker():
+    # Runs once per worker process; touch the engine so the first point does
+    # not pay for lazy NumPy initialisation
+    run_trials(1, 8, 1)
+
+
+def point_key(point):
+    # Integer identity of a parameter combination, stable across CSV round trips
+    return tuple(int(round(float(point[name]) * 1_000_000)) for name in PARAMS)
+
+
+def point_seed(point, base_seed):
+    # Seeds derive from the parameters so a resumed sweep reproduces the
+    # same numbers for the points it has not done yet
+    return int(np.random.SeedSequence([base_seed, *point_key(point)]).generate_state(1)[0])
+
+
+def run_point(index, point, trials, base_seed):
+    seed = point_seed(point, base_seed)
+    channel = Channel(InterceptResend(point['eve_fraction']), Depolarizing(point['depolarizing']))
+    start = time.perf_counter()
+    stats = run_trials(trials, point['num_bits'], point['error_bits'], point['threshold'],
+                       channel, np.random.default_rng(seed))
+    row = {'point': index, **point, 'seed': seed, **stats.summary()}
+    row['seconds'] = round(time.perf_counter() - start, 4)
+    return row
+
+
+def read_rows(path):
+    # Complete rows of an earlier run, and whether any were cut short
+    if not os.path.exists(path):
+        return [], False
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    complete = [row for row in rows if all(row.get(name) not in (None, '') for name in COLUMNS)]
+    return complete, len(complete) < len(rows)
+
+
+def completed_points(rows, trials, base_seed):
+    # Rows from a run with another trial count or seed do not count as done
+    return {point_key(row) for row in rows
+            if int(row['trials']) == trials and int(row['seed']) == point_seed(row, base_seed)}
+
+
+def write_parquet(csv_path):
+    try:
+        import pyarrow.csv as pa_csv
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+    parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
+    pq.write_table(pa_csv.read_csv(csv_path), parquet_path)
+    return parquet_path
+
+
+def run_sweep(points, out_path, trials=2000, workers=None, base_seed=0, progress=print):
+    rows, truncated = read_rows(out_path)
+    done = completed_points(rows, trials, base_seed)
+    todo = [(i, p) for i, p in enumerate(points) if point_key(p) not in done]
+    if progress:
+        progress(f"{len(points)} points, {len(points) - len(todo)} already in {out_path}, {len(todo)} to run")
+    if truncated:
+        # Rewrite without the cut-short rows, so new rows start on a line of their own
+        with open(out_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows({name: row[name] for name in COLUMNS} for row in rows)
+    new_file = not os.path.exists(out_path) or os.path.getsize(out_path) == 0
+    with open(out_path, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        if new_file:
+            writer.writeheader()
+            f.flush()
+        if todo:
+            with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_warm_worker) as pool:
+                futures = [pool.submit(run_point, i, p, trials, base_seed) for i, p in todo]
+                for n, future in enumerate(as_completed(futures), 1):
+                    writer.writerow(future.result())
+                    f.flush()
+                    if progress:
+                        progress(f"[{n}/{len(todo)}] point done")
+    return write_parquet(out_path)
+
+
+def _list(cast):
+    return lambda text: [cast(v) for v in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel, resumable parameter sweep of complete QKD sessions")
+    parser.add_argument('--num-bits', type=_list(int), default=[10, 32, 128])
+    parser.add_argument('--error-bits', type=_list(int), default=[1, 5])
+    parser.add_argument('--threshold', type=_list(float), default=[0.2])
+    parser.add_argument('--depolarizing', type=_list(float), default=[0.0])
+    parser.add_argument('--eve', type=_list(float), default=[0.0])
+    parser.add_argument('--trials', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='sweep_results.csv')
+    args = parser.parse_args()
+
+    points = grid(num_bits=args.num_bits, error_bits=args.error_bits, threshold=args.threshold,
+                  depolarizing=args.depolarizing, eve_fraction=args.eve)
+    start = time.perf_counter()
+    parquet_path = run_sweep(points, args.out, args.trials, args.workers, args.seed)
+    print(f"Sweep finished in {time.perf_counter() - start:.1f} s -> {args.out}"
+          + (f" and {parquet_path}" if parquet_path else ""))
+
+
+if __name__ == '__main__':
+    main()
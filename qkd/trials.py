@@ -0,0 +1,127 @@
+import argparse
+import time
+
+import numpy as np
+
+from qkd import kernel
+from qkd.channel import Channel, channel_from_config
+from qkd.config import load_config
+
+# Monte Carlo engine for complete BB84 sessions.
+#
+# Thousands of protocol instances (generation, sifting, sampling and the
+# abort decision that alice.py makes) run as one computation over a
+# trials x qubits array, so the distribution of sifted length, estimated
+# QBER and abort probability for a num_bits/error_bits setting comes out in
+# well under a second.
+
+ABORT_THRESHOLD = 0.2  # same threshold alice.py uses
+MAX_CELLS = 4_000_000  # trials x qubits simulated per chunk
+
+OK = 0
+ABORT_SHORT = 1  # fewer sifted bits than error_bits
+ABORT_QBER = 2   # sampled error rate above the threshold
+
+
+class TrialStats:
+    def __init__(self, sifted, errors_sampled, qber_true, key_length, outcome, error_bits):
+        self.sifted = sifted
+        self.qber_est = errors_sampled / max(error_bits, 1)
+        self.qber_true = qber_true
+        self.key_length = key_length
+        self.outcome = outcome
+
+    def __len__(self):
+        return len(self.sifted)
+
+    def summary(self):
+        ok = self.outcome == OK
+        return {
+            'trials': len(self),
+            'sifted_mean': float(self.sifted.mean()),
+            'sifted_p5': float(np.percentile(self.sifted, 5)),
+            'sifted_p95': float(np.percentile(self.sifted, 95)),
+            'qber_est_mean': float(self.qber_est[self.outcome != ABORT_SHORT].mean()) if np.any(self.outcome != ABORT_SHORT) else 0.0,
+            'qber_true_mean': float(self.qber_true.mean()),
+            'abort_rate': float(np.mean(~ok)),
+            'abort_short_rate': float(np.mean(self.outcome == ABORT_SHORT)),
+            'abort_qber_rate': float(np.mean(self.outcome == ABORT_QBER)),
+            'key_length_mean': float(self.key_length[ok].mean()) if np.any(ok) else 0.0,
+            'key_length_p5': float(np.percentile(self.key_length[ok], 5)) if np.any(ok) else 0.0,
+        }
+
+
+def _run_chunk(trials, num_bits, error_bits, threshold, channel, rng):
+    shape = (trials, num_bits)
+    alice_bits = rng.integers(2, size=shape, dtype=np.int8)
+    alice_bases = rng.integers(2, size=shape, dtype=np.int8)
+    bob_bases = rng.integers(2, size=shape, dtype=np.int8)
+    batch = channel(kernel.prepare(alice_bits.ravel(), alice_bases.ravel()), rng)
+    bob_bits = kernel.measure(batch, bob_bases.ravel(), rng).reshape(shape)
+
+    sifted_mask = (alice_bases == bob_bases) & (bob_bits != kernel.NO_CLICK)
+    wrong = sifted_mask & (alice_bits != bob_bits)
+    sifted = sifted_mask.sum(axis=1)
+    qber_true = wrong.sum(axis=1) / np.maximum(sifted, 1)
+
+    # Sample error_bits sifted positions per trial: give every sifted slot a
+    # random key, push the others to the end and take the k smallest.
+    errors_sampled = np.zeros(trials, dtype=np.int64)
+    if error_bits > 0:
+        keys = rng.random(shape)
+        keys[~sifted_mask] = 2.0
+        k = min(error_bits, num_bits)
+        picks = np.argpartition(keys, k - 1, axis=1)[:, :k] if k < num_bits else np.argsort(keys, axis=1)
+        errors_sampled = np.take_along_axis(wrong, picks, axis=1).sum(axis=1)
+
+    outcome = np.full(trials, OK, dtype=np.int8)
+    outcome[errors_sampled / max(error_bits, 1) > threshold] = ABORT_QBER
+    outcome[sifted < error_bits] = ABORT_SHORT
+    key_length = np.where(outcome == OK, sifted - error_bits, 0)
+    return sifted, errors_sampled, qber_true, key_length, outcome
+
+
+def run_trials(trials, num_bits, error_bits, threshold=ABORT_THRESHOLD, channel=None, rng=None):
+    channel = channel or Channel()
+    rng = rng or np.random.default_rng()
+    per_chunk = max(1, MAX_CELLS // max(num_bits, 1))
+    parts = []
+    done = 0
+    while done < trials:
+        t = min(per_chunk, trials - done)
+        parts.append(_run_chunk(t, num_bits, error_bits, threshold, channel, rng))
+        done += t
+    columns = [np.concatenate(col) for col in zip(*parts)]
+    return TrialStats(*columns, error_bits)
+
+
+def _int_list(text):
+    return [int(v) for v in str(text).split(',')]
+
+
+def main():
+    config = load_config(defaults={"num_bits": 32, "error_bits": 5})
+    parser = argparse.ArgumentParser(description="Monte Carlo statistics for complete BB84 sessions")
+    parser.add_argument('--trials', type=int, default=10_000)
+    parser.add_argument('--num-bits', default=str(config['num_bits']), help="comma separated list")
+    parser.add_argument('--error-bits', default=str(config['error_bits']), help="comma separated list")
+    parser.add_argument('--threshold', type=float, default=ABORT_THRESHOLD)
+    parser.add_argument('--seed', type=int, default=config.get('seed'))
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    channel = channel_from_config(config)
+    print(f"{'num_bits':>8} {'err_bits':>8} {'sifted':>8} {'QBER est':>8} {'abort':>7} "
+          f"{'short':>7} {'qber':>7} {'key len':>8} {'key p5':>7}")
+    start = time.perf_counter()
+    for num_bits in _int_list(args.num_bits):
+        for error_bits in _int_list(args.error_bits):
+            s = run_trials(args.trials, num_bits, error_bits, args.threshold, channel, rng).summary()
+            print(f"{num_bits:8d} {error_bits:8d} {s['sifted_mean']:8.1f} {s['qber_est_mean']:8.4f} "
+                  f"{s['abort_rate']:7.3f} {s['abort_short_rate']:7.3f} {s['abort_qber_rate']:7.3f} "
+                  f"{s['key_length_mean']:8.1f} {s['key_length_p5']:7.0f}")
+    print(f"{args.trials} trials per setting, {time.perf_counter() - start:.2f} s total")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import importlib
+import json
+import os
+import runpy
+import subprocess
+import sys
+import threading
+import time
+
+# Pre-started workers for the scripts the GUIs launch.
+#
+# Each click in the GUIs used to start a fresh python3 for alice.py, bob.py
+# and the classical scripts, paying for the interpreter and the imports
+# every time. A Pool keeps `size` idle workers that have already imported
+# what the scripts need and are blocked reading stdin. take() hands one
+# worker a script, its arguments and working directory as a single JSON
+# line. The worker then runs the script as __main__, exactly as
+# `python3 -u script.py args` would. Its stdout and stdin stay connected to
+# the caller, so the returned Popen is used like any other, and a
+# replacement worker is started in the same call. `python3 -m qkd.warm
+# --bench` compares cold and warm launches.
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PRELOAD = ("numpy", "cryptography.fernet", "qkd.channel", "qkd.checkpoint", "qkd.config",
+           "qkd.engine", "qkd.instance", "qkd.links", "qkd.protocols", "qkd.randomness", "qkd.session")
+WORKER = [sys.executable, "-u", "-m", "qkd.warm"]
+
+
+def _job(cmd, cwd=None):
+    # ["python3", "-u", "alice.py", "--port", "0"] -> the JSON line a worker runs
+    rest = list(cmd[1:])
+    while rest and rest[0].startswith("-"):
+        rest.pop(0)  # interpreter flags; workers always run unbuffered
+    if not rest:
+        raise ValueError(f"no script in {cmd}")
+    cwd = os.path.abspath(cwd or os.getcwd())
+    return json.dumps({"script": os.path.join(cwd, rest[0]), "args": rest[1:], "cwd": cwd}) + "\n"
+
+
+class Pool:
+    def __init__(self, size=2):
+        self.size = size
+        self.lock = threading.Lock()
+        self.closed = False
+        self.idle = [self._spawn() for _ in range(size)]
+
+    def _spawn(self):
+        return subprocess.Popen(WORKER, cwd=ROOT, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT, text=True, bufsize=1)
+
+    def take(self, cmd, cwd=None):
+        # Run `cmd` on an idle worker and return its Popen; a cold one is
+        # started when every worker is busy or the pool is closed
+        job = _job(cmd, cwd)
+        worker = None
+        with self.lock:
+            while self.idle and worker is None:
+                candidate = self.idle.pop(0)
+                if candidate.poll() is None:
+                    worker = candidate
+            if not self.closed:
+                self.idle.append(self._spawn())
+        if worker is None:
+            worker = self._spawn()
+        worker.stdin.write(job)
+        worker.stdin.flush()
+        return worker
+
+    def close(self):
+        # Idle workers exit when their stdin closes; taken ones are the caller's
+        with self.lock:
+            self.closed = True
+            idle, self.idle = self.idle, []
+        for worker in idle:
+            worker.stdin.close()
+        for worker in idle:
+            try:
+                worker.wait(1)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+            worker.stdout.close()
+
+
+def serve():
+    # Worker side: import everything up front, then run the one job we are given
+    for name in PRELOAD:
+        importlib.import_module(name)
+    line = sys.stdin.readline()
+    if not line:
+        return
+    job = json.loads(line)
+    os.chdir(job["cwd"])
+    sys.argv = [job["script"]] + job["args"]
+    sys.path[0] = os.path.dirname(job["script"])
+    runpy.run_path(job["script"], run_name="__main__")
+
+
+def _first_line(start, proc):
+    line = proc.stdout.readline()
+    seconds = time.perf_counter() - start
+    proc.stdout.read()
+    proc.wait()
+    proc.stdout.close()
+    return seconds, line.strip()
+
+
+def bench(runs=5):
+    # Seconds from asking for a launch of alice.py --help to its first output line
+    cmd = [sys.executable, "-u", "alice.py", "--help"]
+    cwd = os.path.join(ROOT, "Alice")
+    cold = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, cwd=cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT, text=True)
+        cold.append(_first_line(start, proc)[0])
+    pool = Pool(1)
+    warm = []
+    for _ in range(runs):
+        time.sleep(0.5)  # let the replacement worker finish its imports
+        start = time.perf_counter()
+        warm.append(_first_line(start, pool.take(cmd, cwd))[0])
+    pool.close()
+    return cold, warm
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm worker for the QKD scripts (reads one job from stdin)")
+    parser.add_argument('--bench', type=int, metavar='RUNS', help="compare cold and warm launches instead")
+    args = parser.parse_args()
+    if args.bench is None:
+        serve()
+        return
+    cold, warm = bench(args.bench)
+    print(f"cold launch: {min(cold) * 1000:7.1f} ms (best of {len(cold)})")
+    print(f"warm launch: {min(warm) * 1000:7.1f} ms (best of {len(warm)})")
+
+
+if __name__ == '__main__':
+    main()
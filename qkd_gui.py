@@ -1,42 +1,38 @@
 import sys
 import os
 import random
+import tempfile
 from PyQt5.QtWidgets import (
-    QApplication, QWidget, QLabel, QPushButton, QTextEdit, QGridLayout, QSpinBox, QScrollArea, QVBoxLayout
+    QApplication, QWidget, QLabel, QPushButton, QTextEdit, QGridLayout, QSpinBox, QVBoxLayout
 )
 from PyQt5.QtGui import QPixmap, QPainter, QColor, QPen, QFont
-from PyQt5.QtCore import Qt, QTimer, QPointF, QThread, pyqtSignal
-import subprocess
-import psutil
-
-class ScriptRunner(QThread):
-    output_signal = pyqtSignal(str)
-    def __init__(self, cmd, cwd=None):
-        super().__init__()
-        self.cmd = cmd
-        self.cwd = cwd
-        self.proc = None
-
-    def run(self):
-        self.proc = subprocess.Popen(
-            self.cmd, cwd=self.cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
-        )
-        for line in self.proc.stdout:
-            self.output_signal.emit(line.rstrip())
-        self.proc.wait()
-
-    def stop(self):
-        if self.proc:
-            self.proc.terminate()
+from PyQt5.QtCore import Qt, QTimer, QPointF, pyqtSignal
+from qkd import links, supervisor, warm
+from qkd.animation import Animator
+from qkd.guirunner import ScriptRunner
+from qkd.logview import LogView
+from qkd.config import load_config
 
 class QKDGui(QWidget):
+    # (name, event, detail) from the supervisor's threads, handled on the GUI thread
+    supervisor_event = pyqtSignal(str, str, object)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle('Quantum-Assisted Cryptographic Engine')
         self.setFixedSize(1920, 1080)
+        # Idle workers for the scripts started below; a QKD or classical
+        # pair starts together, and taking one starts its replacement
+        self.pool = warm.Pool(2)
+        # Children are tracked by pid and report ready/exited events, which
+        # drive the transitions below instead of fixed delays and polling
+        self.supervisor = supervisor.Supervisor(self.pool, self.supervisor_event.emit)
+        self.supervisor_event.connect(self.handle_supervisor_event)
+        self.runners = set()
+        self.qkd_exits = {}
+        self.animator = Animator(self)
         self.setup_ui()
         self.reset_qkd_state()
-        self.message_anim = None
         self.classical_alice_runner = None
         self.classical_bob_runner = None
         self.mitm_mode = False
@@ -141,17 +137,10 @@ class QKDGui(QWidget):
         self.layout.addWidget(self.bob_send_btn, 6, 2)
 
         # Visualization area (scrollable)
-        self.visualization = QLabel('', self)
-        self.visualization.setAlignment(Qt.AlignTop | Qt.AlignLeft)
-        self.visualization.setWordWrap(True)
-        self.visualization.setMinimumHeight(120)
+        self.visualization = LogView(self)
         self.visualization.setFont(QFont('Arial', 12))
-
-        self.scroll_area = QScrollArea(self)
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setWidget(self.visualization)
-        self.scroll_area.setFixedHeight(200)
-        self.layout.addWidget(self.scroll_area, 7, 0, 1, 5)
+        self.visualization.setFixedHeight(200)
+        self.layout.addWidget(self.visualization, 7, 0, 1, 5)
 
         # MITM Button and label (centered between classical devices)
         self.mitm_widget = QWidget(self)
@@ -190,48 +179,44 @@ class QKDGui(QWidget):
         self.key_label.setText('QKD Key: (not generated)')
         self.visualization.setText('')
         self.qkd_button.setEnabled(True)
-        self.message_anim = None
 
     def start_qkd_animation(self):
-        import os
-        os.makedirs("extras", exist_ok=True)
         num_bits = self.bits_spin.value()
         error_bits = self.error_spin.value()
-        with open("extras/qkd_config.txt", "w") as f:
-            f.write("# QKD Configuration File\n")
-            f.write(f"num_bits={num_bits}\n")
-            f.write(f"error_bits={error_bits}\n")
         self.reset_qkd_state()
         self.qkd_button.setEnabled(False)
         self.visualization.setText(f'QKD protocol started. Generating {num_bits} random bits and {error_bits} error check bits...')
-        # Wait for both key files to exist, then restart classical processes
-        def wait_for_keys_and_restart():
-            alice_key = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Alice", "final_key_alice.txt")
-            bob_key = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Bob", "final_key_bob.txt")
-            import time
-            waited = 0
-            while waited < 20:  # Wait up to 20 seconds
-                if os.path.exists(alice_key) and os.path.exists(bob_key):
-                    self.append_visualization("[Debug] QKD key files detected. Starting classical processes.")
-                    QTimer.singleShot(0, lambda: self.restart_classical_processes(mitm_mode=self.mitm_mode))
-                    return
-                time.sleep(0.5)
-                waited += 0.5
-            self.append_visualization("[Debug] Timeout waiting for QKD key files! Classical processes not started.")
-        import threading
-        threading.Thread(target=wait_for_keys_and_restart, daemon=True).start()
-        # Re-enable the QKD button after a short delay to allow regeneration
-        QTimer.singleShot(2500, lambda: self.qkd_button.setEnabled(True))
+        # The classical processes restart, and the button comes back, when
+        # both QKD processes have exited (see handle_supervisor_event)
+        self.start_qkd_processes()
+
+    def run_script(self, name, cmd, cwd, handler, **policy):
+        # Start `cmd` under the supervisor as `name` (replacing the previous
+        # child of that name) and forward its output to `handler`
+        runner = ScriptRunner(self.supervisor.start(name, cmd, cwd, **policy))
+        runner.output_signal.connect(handler)
+        # Keep the runner referenced until its last line is delivered
+        self.runners.add(runner)
+        runner.done_signal.connect(lambda: self.runners.discard(runner))
+        runner.start()
+        return runner
+
+    def handle_supervisor_event(self, name, event, detail):
+        if name in ("qkd_alice", "qkd_bob") and event == "exited":
+            self.qkd_exits[name] = detail
+            if len(self.qkd_exits) == 2:
+                self.qkd_button.setEnabled(True)
+                if all(code == 0 for code in self.qkd_exits.values()):
+                    self.append_visualization("[Debug] QKD keys saved. Starting classical processes.")
+                    self.restart_classical_processes(mitm_mode=self.mitm_mode)
+                else:
+                    self.append_visualization("[Debug] QKD processes failed! Classical processes not started.")
+        elif event in ("restarting", "timeout"):
+            self.append_visualization(f"[Supervisor] {name}: {event} ({detail})")
 
     def append_visualization(self, text):
-        current = self.visualization.text()
-        self.visualization.setText(current + ("\n" if current else "") + text)
-        self.visualization.repaint()
-        # Use a single-shot timer to scroll after the event loop updates the layout
-        QTimer.singleShot(0, self.scroll_to_bottom)
-
-    def scroll_to_bottom(self):
-        self.scroll_area.verticalScrollBar().setValue(self.scroll_area.verticalScrollBar().maximum())
+        # Queued; the log view inserts and scrolls once per frame
+        self.visualization.append(text)
 
     def qkd_animate_step(self):
         # Step 1: Show bit and basis generation
@@ -250,7 +235,6 @@ class QKDGui(QWidget):
                 self.append_visualization(f"Bob measures in wrong basis, gets random bit: {measured}")
             self.qkd_bob_results.append(measured)
             self.qkd_step += 1
-            self.update()
             return
 
         # Step 2: Sifting
@@ -261,7 +245,6 @@ class QKDGui(QWidget):
             self.append_visualization(f"Sifted key indices: {self.qkd_sifted_indices}")
             self.append_visualization(f"Sifted key: {''.join(map(str, self.qkd_sifted_key))}")
             self.qkd_step += 1
-            self.update()
             return
 
         # Step 3: Error estimation
@@ -284,7 +267,6 @@ class QKDGui(QWidget):
                 f"Errors: {errors}/{self.qkd_error_bits}, Error rate: {self.qkd_error_rate:.2f}"
             )
             self.qkd_step += 1
-            self.update()
             return
 
         # Step 4: Final key extraction and transmission animation
@@ -308,26 +290,11 @@ class QKDGui(QWidget):
         # Animate a green circle moving from QKD Alice to QKD Bob to represent key sharing
         start = self.get_device_center(self.qkd_alice)
         end = self.get_device_center(self.qkd_bob)
-        self.key_anim = {'start': start, 'end': end, 'pos': start, 'step': 0}
-        self.key_timer = QTimer(self)
-        self.key_timer.timeout.connect(self.update_key_anim)
-        self.key_timer.start(30)
+        self.animator.add(start, end, self.key_transmitted)
         self.append_visualization("Transmitting the final key from QKD Alice to QKD Bob...")
 
-    def update_key_anim(self):
-        anim = self.key_anim
-        if anim['step'] >= 30:
-            self.key_timer.stop()
-            self.key_anim = None
-            self.append_visualization("Key successfully shared between QKD Alice and QKD Bob!")
-            self.visualization.repaint()
-            return
-        t = anim['step'] / 30
-        x = anim['start'].x() + (anim['end'].x() - anim['start'].x()) * t
-        y = anim['start'].y() + (anim['end'].y() - anim['start'].y()) * t
-        anim['pos'] = QPointF(x, y)
-        anim['step'] += 1
-        self.update()
+    def key_transmitted(self):
+        self.append_visualization("Key successfully shared between QKD Alice and QKD Bob!")
 
     def get_device_center(self, widget):
         # Returns the center point of a widget in window coordinates
@@ -354,49 +321,23 @@ class QKDGui(QWidget):
         painter.drawLine(p1, p3)
         painter.drawLine(p2, p4)
 
-        # Draw animated message if any (green circle)
-        if self.message_anim:
-            painter.setBrush(QColor(0, 200, 0))  # Green
-            painter.setPen(Qt.NoPen)
-            painter.drawEllipse(self.message_anim['pos'], 18, 18)
-
-        # Draw animated key transmission (green circle)
-        if hasattr(self, 'key_anim') and self.key_anim:
-            painter.setBrush(QColor(0, 200, 0))  # Green
-            painter.setPen(Qt.NoPen)
-            painter.drawEllipse(self.key_anim['pos'], 18, 18)
+        # Draw the keys and messages in flight (green circles)
+        self.animator.paint(painter)
 
     def animate_message(self, from_widget, to_widget, text, receiver_box):
-        # Animate a message (circle) moving from from_widget to to_widget
+        # Animate a message (circle) moving from from_widget to to_widget;
+        # several can be in flight, each is shown on arrival
         start = self.get_device_center(from_widget)
         end = self.get_device_center(to_widget)
-        self.message_anim = {'start': start, 'end': end, 'pos': start, 'step': 0, 'text': text, 'receiver_box': receiver_box}
-        self.msg_timer = QTimer(self)
-        self.msg_timer.timeout.connect(self.update_message_anim)
-        self.msg_timer.start(30)
-
-    def update_message_anim(self):
-        anim = self.message_anim
-        if anim['step'] >= 30:
-            self.msg_timer.stop()
-            self.message_anim = None
-            anim['receiver_box'].setText(f"Decrypted: {anim['text']}")
-            self.visualization.setText(f"Message delivered: {anim['text']}")
-            self.update()
-            return
-        t = anim['step'] / 30
-        x = anim['start'].x() + (anim['end'].x() - anim['start'].x()) * t
-        y = anim['start'].y() + (anim['end'].y() - anim['start'].y()) * t
-        anim['pos'] = QPointF(x, y)
-        anim['step'] += 1
-        self.update()
+        self.animator.add(start, end, lambda: self.deliver_message(text, receiver_box))
+
+    def deliver_message(self, text, receiver_box):
+        receiver_box.setText(f"Decrypted: {text}")
+        self.append_visualization(f"Message delivered: {text}")
 
     def start_qkd_processes(self):
-        # Stop any previous QKD processes
-        if hasattr(self, 'alice_runner') and self.alice_runner:
-            self.alice_runner.terminate()
-        if hasattr(self, 'bob_runner') and self.bob_runner:
-            self.bob_runner.terminate()
+        # Starting under the same names replaces any previous QKD processes
+        self.qkd_exits = {}
         project_root = os.path.dirname(os.path.abspath(__file__))
         alice_dir = os.path.join(project_root, "Alice")
         bob_dir = os.path.join(project_root, "Bob")
@@ -432,16 +373,15 @@ class QKDGui(QWidget):
                     self.qkd_showing_qkd = True
                     self.qkd_output_timer.start(500)
 
-        self.alice_runner = ScriptRunner(["python3", "alice.py"], cwd=alice_dir)
-        self.bob_runner = ScriptRunner(["python3", "bob.py"], cwd=bob_dir)
-        self.alice_runner.output_signal.connect(handle_alice_output)
-        self.bob_runner.output_signal.connect(handle_bob_output)
-        self.alice_runner.start()
-        def start_bob():
-            self.bob_runner = ScriptRunner(["python3", "bob.py"], cwd=bob_dir)
-            self.bob_runner.output_signal.connect(handle_bob_output)
-            self.bob_runner.start()
-        QTimer.singleShot(1000, start_bob)
+        rendezvous = os.path.join(tempfile.gettempdir(), f"qkd-gui-{os.getpid()}.json")
+        if os.path.exists(rendezvous):
+            os.remove(rendezvous)
+        session_args = ["--set", f"num_bits={self.bits_spin.value()}", "--set", f"error_bits={self.error_spin.value()}",
+                        "--rendezvous", rendezvous]
+        # Bob waits for Alice's address in the rendezvous file, so both start together
+        self.alice_runner = self.run_script("qkd_alice", ["python3", "alice.py", "--port", "0"] + session_args,
+                                            alice_dir, handle_alice_output)
+        self.bob_runner = self.run_script("qkd_bob", ["python3", "bob.py"] + session_args, bob_dir, handle_bob_output)
 
     def _show_next_qkd_line(self):
         if self.qkd_output_queue:
@@ -456,15 +396,15 @@ class QKDGui(QWidget):
         msg = self.alice_msg_box.toPlainText()
         if msg.startswith("Decrypted: "):
             msg = msg[len("Decrypted: ") :]
-        if msg and self.qkd_final_key:
+        alice = self.supervisor.get("classical_alice") or self.supervisor.get("mitm")
+        if msg and self.qkd_final_key and not (alice and alice.ready.is_set()):
+            self.visualization.setText("Classical Alice is still starting, try again in a moment.")
+        elif msg and self.qkd_final_key:
             self.append_visualization(f'Alice encrypts and sends: "{msg}" to Bob')
             # Send message to already running classical Alice process via socket
-            import socket
             try:
-                s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                s.connect(("127.0.0.1", 65433))  # Alice's server port
-                s.sendall(msg.encode("utf-8"))
-                s.close()
+                with links.connect(links.address(load_config(), "alice")) as s:  # Alice's server
+                    s.sendall(msg.encode("utf-8"))
             except Exception as e:
                 self.append_visualization(f"[Error] Could not send from Alice: {e}")
         else:
@@ -475,15 +415,15 @@ class QKDGui(QWidget):
         msg = self.bob_msg_box.toPlainText()
         if msg.startswith("Decrypted: "):
             msg = msg[len("Decrypted: ") :]
-        if msg and self.qkd_final_key:
+        bob = self.supervisor.get("classical_bob") or self.supervisor.get("mitm")
+        if msg and self.qkd_final_key and not (bob and bob.ready.is_set()):
+            self.visualization.setText("Classical Bob is still starting, try again in a moment.")
+        elif msg and self.qkd_final_key:
             self.append_visualization(f'Bob encrypts and sends: "{msg}" to Alice')
             # Send message to already running classical Bob process via socket
-            import socket
             try:
-                s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                s.connect(("127.0.0.1", 65434))  # Bob's server port
-                s.sendall(msg.encode("utf-8"))
-                s.close()
+                with links.connect(links.address(load_config(), "bob")) as s:  # Bob's server
+                    s.sendall(msg.encode("utf-8"))
             except Exception as e:
                 self.append_visualization(f"[Error] Could not send from Bob: {e}")
         else:
@@ -507,56 +447,45 @@ class QKDGui(QWidget):
             self.mitm_button.setStyleSheet('background-color: #888; border-radius: 8px;')
             self.mitm_label.setText('MITM: Off')
             self.visualization.setText('MITM mode disabled. Restarting classical processes in normal mode...')
-            if hasattr(self, 'mitm_runner') and self.mitm_runner:
-                self.mitm_runner.terminate()
-                self.mitm_runner = None
-            # Wait for ports to be released, then restart classical processes
-            QTimer.singleShot(2000, lambda: self.restart_classical_processes(mitm_mode=False))
+            # Stopping waits for the MITM to exit, so its ports are free now
+            self.supervisor.stop("mitm")
+            self.mitm_runner = None
+            self.restart_classical_processes(mitm_mode=False)
 
     def restart_classical_processes(self, mitm_mode, for_mitm=False):
-        # Stop any previous classical processes
-        if hasattr(self, 'classical_alice_runner') and self.classical_alice_runner:
-            self.classical_alice_runner.terminate()
-            self.classical_alice_runner = None
-        if hasattr(self, 'classical_bob_runner') and self.classical_bob_runner:
-            self.classical_bob_runner.terminate()
-            self.classical_bob_runner = None
-        # Kill any lingering processes by name
-        kill_process_by_name("classical_alice.py")
-        kill_process_by_name("classical_bob.py")
+        # Stop any previous classical processes; stop() waits for them to
+        # exit, so their ports are free on return
+        self.supervisor.stop("classical_alice")
+        self.supervisor.stop("classical_bob")
+        self.classical_alice_runner = None
+        self.classical_bob_runner = None
         project_root = os.path.dirname(os.path.abspath(__file__))
+        # The servers count as ready once their links accept a connection
+        config = load_config()
         if not mitm_mode:
             # Start classical Alice
             args_alice = ["python3", "-u", "Alice/classical_alice.py"]
-            self.classical_alice_runner = ScriptRunner(args_alice, cwd=project_root)
-            self.classical_alice_runner.output_signal.connect(self.handle_classical_alice_output)
-            self.classical_alice_runner.start()
+            self.classical_alice_runner = self.run_script("classical_alice", args_alice, project_root,
+                                                          self.handle_classical_alice_output,
+                                                          ready_link=links.address(config, "alice"), restart="on-failure")
             # Start classical Bob
             args_bob = ["python3", "-u", "Bob/classical_bob.py"]
-            self.classical_bob_runner = ScriptRunner(args_bob, cwd=project_root)
-            self.classical_bob_runner.output_signal.connect(self.handle_classical_bob_output)
-            self.classical_bob_runner.start()
+            self.classical_bob_runner = self.run_script("classical_bob", args_bob, project_root,
+                                                        self.handle_classical_bob_output,
+                                                        ready_link=links.address(config, "bob"), restart="on-failure")
         elif for_mitm:
-            # Wait for ports to be released, then start MITM
-            QTimer.singleShot(2000, self._start_mitm_after_ports_free)
+            self._start_mitm_after_ports_free()
 
     def _start_mitm_after_ports_free(self):
         project_root = os.path.dirname(os.path.abspath(__file__))
         mitm_path = os.path.join(project_root, "MITM", "classical_mitm.py")
-        if hasattr(self, 'mitm_runner') and self.mitm_runner:
-            self.mitm_runner.terminate()
-        self.mitm_runner = ScriptRunner(["python3", mitm_path], cwd=project_root)
-        self.mitm_runner.output_signal.connect(self.handle_mitm_output)
-        self.mitm_runner.start()
+        self.mitm_runner = self.run_script("mitm", ["python3", mitm_path], project_root, self.handle_mitm_output,
+                                           ready_line="MITM: Waiting for Alice and Bob", restart="on-failure")
 
     def closeEvent(self, event):
         # Terminate all background processes
-        if hasattr(self, 'mitm_runner') and self.mitm_runner:
-            self.mitm_runner.stop()
-        if hasattr(self, 'classical_alice_runner') and self.classical_alice_runner:
-            self.classical_alice_runner.stop()
-        if hasattr(self, 'classical_bob_runner') and self.classical_bob_runner:
-            self.classical_bob_runner.stop()
+        self.supervisor.stop_all()
+        self.pool.close()
         event.accept()
 
     def handle_classical_alice_output(self, line):
@@ -579,17 +508,6 @@ class QKDGui(QWidget):
             except Exception:
                 pass
 
-def kill_process_by_name(name):
-    for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-        try:
-            cmdline = proc.info.get('cmdline')
-            if not cmdline:
-                continue
-            if name in ' '.join(cmdline):
-                proc.kill()
-        except (psutil.NoSuchProcess, psutil.AccessDenied, TypeError):
-            continue
-
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     gui = QKDGui()
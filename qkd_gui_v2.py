@@ -1,63 +1,32 @@
 import sys
 import os
-import psutil
+import tempfile
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton, QTextEdit, QGridLayout, QSpinBox, QVBoxLayout
 )
 from PyQt5.QtGui import QPixmap, QPainter, QColor, QPen, QFont
-from PyQt5.QtCore import Qt, QTimer, QPoint, QThread, pyqtSignal
-
-class ScriptRunner(QThread):
-    output_signal = pyqtSignal(str)
-    def __init__(self, cmd, cwd=None):
-        super().__init__()
-        self.cmd = cmd
-        self.cwd = cwd
-        self.proc = None
-
-    def run(self):
-        import subprocess
-        self.proc = subprocess.Popen(
-            self.cmd,
-            cwd=self.cwd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            stdin=subprocess.PIPE,
-            text=True,
-            bufsize=1
-        )
-        for line in self.proc.stdout:
-            self.output_signal.emit(line.rstrip())
-        self.proc.wait()
-
-    def stop(self):
-        if self.proc:
-            self.proc.terminate()
-
-    def send_stdin(self, msg):
-        if self.proc and self.proc.stdin:
-            try:
-                self.proc.stdin.write(msg + "\n")
-                self.proc.stdin.flush()
-            except Exception:
-                pass
-
-def kill_process_by_name(name):
-    for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-        try:
-            cmdline = proc.info.get('cmdline')
-            if not cmdline:
-                continue
-            if name in ' '.join(cmdline):
-                proc.kill()
-        except (psutil.NoSuchProcess, psutil.AccessDenied, TypeError):
-            continue
+from PyQt5.QtCore import Qt, QTimer, QPoint, pyqtSignal
+from qkd import supervisor, warm
+from qkd.guirunner import ScriptRunner
+from qkd.logview import LogView
 
 class QKDControlGUI(QWidget):
+    # (name, event, detail) from the supervisor's threads, handled on the GUI thread
+    supervisor_event = pyqtSignal(str, str, object)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle('Quantum-Assisted Cryptographic Engine')
         self.setFixedSize(1920, 1080)
+        # Idle workers for the scripts started below; a QKD or classical
+        # pair starts together, and taking one starts its replacement
+        self.pool = warm.Pool(2)
+        # Children are tracked by pid and report ready/exited events, which
+        # drive the transitions below instead of fixed delays
+        self.supervisor = supervisor.Supervisor(self.pool, self.supervisor_event.emit)
+        self.supervisor_event.connect(self.handle_supervisor_event)
+        self.runners = set()
+        self.pending_classical = None
         self.setup_ui()
         self.classical_alice_runner = None
         self.classical_bob_runner = None
@@ -174,8 +143,7 @@ class QKDControlGUI(QWidget):
         self.layout.addWidget(self.bob_decrypted_box, 7, 2)
 
         # Visualization area (scrollable, now QTextEdit)
-        self.visualization = QTextEdit(self)
-        self.visualization.setReadOnly(True)
+        self.visualization = LogView(self)
         self.visualization.setFont(QFont('Arial', 12))
         self.visualization.setMinimumHeight(120)
         self.layout.addWidget(self.visualization, 8, 0, 1, 5)
@@ -198,11 +166,8 @@ class QKDControlGUI(QWidget):
         self.mitm_button.raise_()
 
     def append_visualization(self, text):
+        # Queued; the log view inserts and scrolls once per frame
         self.visualization.append(text)
-        QTimer.singleShot(0, self.scroll_to_bottom)
-
-    def scroll_to_bottom(self):
-        self.visualization.verticalScrollBar().setValue(self.visualization.verticalScrollBar().maximum())
 
     def paintEvent(self, event):
         super().paintEvent(event)
@@ -258,31 +223,53 @@ class QKDControlGUI(QWidget):
         )
         self.mitm_label.setStyleSheet("padding-top: 50px;")  # Adjust 50px as needed for your button size
 
+    def run_script(self, name, cmd, cwd, handler, **policy):
+        # Start `cmd` under the supervisor as `name` (replacing the previous
+        # child of that name) and forward its output to `handler`
+        runner = ScriptRunner(self.supervisor.start(name, cmd, cwd, **policy))
+        runner.output_signal.connect(handler)
+        # Keep the runner referenced until its last line is delivered
+        self.runners.add(runner)
+        runner.done_signal.connect(lambda: self.runners.discard(runner))
+        runner.start()
+        return runner
+
+    def handle_supervisor_event(self, name, event, detail):
+        if name == "mitm" and event == "ready" and self.pending_classical:
+            # Alice and Bob connect to the MITM, so they start once it listens
+            alice_cmd, bob_cmd, alice_dir, bob_dir = self.pending_classical
+            self.pending_classical = None
+            self._start_classical(alice_cmd, bob_cmd, alice_dir, bob_dir)
+        elif name == "qkd_alice" and event == "exited":
+            # Alice saves her key before exiting
+            self.update_key_label()
+        elif event in ("restarting", "timeout"):
+            self.append_visualization(f"[Supervisor] {name}: {event} ({detail})")
+
     def start_qkd_animation(self):
-        kill_process_by_name("alice.py")
-        kill_process_by_name("bob.py")
-        QTimer.singleShot(500, self._do_qkd_generation)
+        # Starting under the same names replaces the previous run's processes
+        self._do_qkd_generation()
 
     def _do_qkd_generation(self):
-        os.makedirs("extras", exist_ok=True)
         num_bits = self.bits_spin.value()
         error_bits = self.error_spin.value()
-        with open("extras/qkd_config.txt", "w") as f:
-            f.write("# QKD Configuration File\n")
-            f.write(f"num_bits={num_bits}\n")
-            f.write(f"error_bits={error_bits}\n")
+        # Per-run settings on the command line instead of rewriting
+        # extras/qkd_config.txt; Alice picks a free port and Bob finds it
+        # through the rendezvous file
+        rendezvous = os.path.join(tempfile.gettempdir(), f"qkd-gui-{os.getpid()}.json")
+        if os.path.exists(rendezvous):
+            os.remove(rendezvous)
+        session_args = ["--set", f"num_bits={num_bits}", "--set", f"error_bits={error_bits}",
+                        "--rendezvous", rendezvous]
         self.key_label.setText('QKD Key: (not generated)')
         self.visualization.clear()
         self.visualization.append(f'QKD protocol started. Generating {num_bits} random bits and {error_bits} error check bits...')
         alice_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Alice")
         bob_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Bob")
-        self.qkd_alice_runner = ScriptRunner(["python3", "-u", "alice.py"], cwd=alice_dir)
-        self.qkd_bob_runner = ScriptRunner(["python3", "-u", "bob.py"], cwd=bob_dir)
-        self.qkd_alice_runner.output_signal.connect(lambda line: self.visualization.append("[QKD Alice] " + line))
-        self.qkd_bob_runner.output_signal.connect(lambda line: self.visualization.append("[QKD Bob] " + line))
-        self.qkd_alice_runner.start()
-        self.qkd_bob_runner.start()
-        QTimer.singleShot(2500, self.update_key_label)
+        self.qkd_alice_runner = self.run_script("qkd_alice", ["python3", "-u", "alice.py", "--port", "0"] + session_args, alice_dir,
+                                                lambda line: self.visualization.append("[QKD Alice] " + line))
+        self.qkd_bob_runner = self.run_script("qkd_bob", ["python3", "-u", "bob.py"] + session_args, bob_dir,
+                                              lambda line: self.visualization.append("[QKD Bob] " + line))
 
     def update_key_label(self):
         key_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Alice", "final_key_alice.txt")
@@ -327,20 +314,16 @@ class QKDControlGUI(QWidget):
             self.mitm_button.setStyleSheet('background-color: #888; border-radius: 8px;')
             self.mitm_label.setText('MITM: Off')
             self.append_visualization('MITM mode disabled. Restarting classical processes in normal mode...')
-            if self.mitm_runner:
-                self.mitm_runner.stop()
-                self.mitm_runner = None
-            QTimer.singleShot(2000, lambda: self.restart_classical_processes(mitm_mode=False))
+            # Stops the MITM and waits for it to exit, so its ports are free
+            # for the classical servers straight away
+            self.restart_classical_processes(mitm_mode=False)
 
     def restart_classical_processes(self, mitm_mode=False):
-        if self.classical_alice_runner:
-            self.classical_alice_runner.stop()
-            self.classical_alice_runner = None
-        if self.classical_bob_runner:
-            self.classical_bob_runner.stop()
-            self.classical_bob_runner = None
-        kill_process_by_name("classical_alice.py")
-        kill_process_by_name("classical_bob.py")
+        self.supervisor.stop("classical_alice")
+        self.supervisor.stop("classical_bob")
+        self.classical_alice_runner = None
+        self.classical_bob_runner = None
+        self.pending_classical = None
         project_root = os.path.dirname(os.path.abspath(__file__))
         alice_dir = os.path.join(project_root, "Alice")
         bob_dir = os.path.join(project_root, "Bob")
@@ -352,33 +335,24 @@ class QKDControlGUI(QWidget):
             # Start MITM process
             mitm_dir = os.path.join(project_root, "MITM")
             mitm_cmd = ["python3", "-u", "classical_mitm.py"]
-            if self.mitm_runner:
-                self.mitm_runner.stop()
-            self.mitm_runner = ScriptRunner(mitm_cmd, cwd=mitm_dir)
-            self.mitm_runner.output_signal.connect(self.handle_mitm_output)
-            self.mitm_runner.start()
-            QTimer.singleShot(1500, lambda: self._start_classical(alice_cmd, bob_cmd, alice_dir, bob_dir))
+            # Alice and Bob start on the MITM's ready event
+            self.pending_classical = (alice_cmd, bob_cmd, alice_dir, bob_dir)
+            self.mitm_runner = self.run_script("mitm", mitm_cmd, mitm_dir, self.handle_mitm_output,
+                                               ready_line="MITM: Waiting for Alice and Bob", restart="on-failure")
         else:
-            if self.mitm_runner:
-                self.mitm_runner.stop()
-                self.mitm_runner = None
+            self.supervisor.stop("mitm")
+            self.mitm_runner = None
             self._start_classical(alice_cmd, bob_cmd, alice_dir, bob_dir)
 
     def _start_classical(self, alice_cmd, bob_cmd, alice_dir, bob_dir):
-        self.classical_alice_runner = ScriptRunner(alice_cmd, cwd=alice_dir)
-        self.classical_bob_runner = ScriptRunner(bob_cmd, cwd=bob_dir)
-        self.classical_alice_runner.output_signal.connect(self.handle_classical_alice_output)
-        self.classical_bob_runner.output_signal.connect(self.handle_classical_bob_output)
-        self.classical_alice_runner.start()
-        self.classical_bob_runner.start()
+        self.classical_alice_runner = self.run_script("classical_alice", alice_cmd, alice_dir,
+                                                      self.handle_classical_alice_output, restart="on-failure")
+        self.classical_bob_runner = self.run_script("classical_bob", bob_cmd, bob_dir,
+                                                    self.handle_classical_bob_output, restart="on-failure")
 
     def closeEvent(self, event):
-        if self.mitm_runner:
-            self.mitm_runner.stop()
-        if self.classical_alice_runner:
-            self.classical_alice_runner.stop()
-        if self.classical_bob_runner:
-            self.classical_bob_runner.stop()
+        self.supervisor.stop_all()
+        self.pool.close()
         event.accept()
 
     def handle_classical_alice_output(self, line):
@@ -1,8 +1,22 @@
+import argparse
+import time
 import cirq
 import numpy as np
 
+from qkd import kernel
+from qkd.channel import Channel, Depolarizing, BitFlip, PhaseFlip, PhotonLoss, InterceptResend
+from qkd.stabilizer import StabilizerSimulator
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--num-bits", type=int, default=32)
+parser.add_argument("--backend", choices=["cirq", "tableau"], default="cirq",
+                    help="tableau = stabilizer simulation, polynomial in the number of qubits")
+parser.add_argument("--entangled", action="store_true", help="also run the entanglement-based (BBM92) variant")
+parser.add_argument("--sweep", action="store_true")
+args = parser.parse_args()
+
 # Number of bits (qubits) we want to use to generate the key
-num_bits = 32
+num_bits = args.num_bits
 
 # STEP 1: ALICE'S PREPARATION
 
@@ -45,8 +59,9 @@ for i in range(num_bits):
 
 # STEP 4: SIMULATION
 
-# Create a simulator to run the quantum circuit
-simulator = cirq.Simulator()
+# Create a simulator to run the quantum circuit. Every gate here is Clifford,
+# so the stabilizer backend gives the same statistics without a state vector.
+simulator = StabilizerSimulator() if args.backend == "tableau" else cirq.Simulator()
 
 # Run the circuit and store the measurement results
 result = simulator.run(circuit)
@@ -67,3 +82,62 @@ print(f"Alice's Bases      : {alice_bases}")
 print(f"Bob's Bases        : {bob_bases}")
 print(f"Bob's Measurements : {bob_results}")
 print(f"Sifted Key         : {sifted_key}")
+
+# STEP 7: CHANNEL MODELS (VECTORIZED)
+
+# The same protocol on whole qubit arrays: every stage below acts on all
+# qubits at once, so a QBER-versus-noise study over millions of qubits takes
+# seconds. Run with --sweep to print the table.
+
+def run_bb84_batch(num_bits, channel, rng):
+    alice_bits = rng.integers(2, size=num_bits)
+    alice_bases = rng.integers(2, size=num_bits)
+    bob_bases = rng.integers(2, size=num_bits)
+    batch = channel(kernel.prepare(alice_bits, alice_bases), rng)
+    bob_results = kernel.measure(batch, bob_bases, rng)
+    sifted = (alice_bases == bob_bases) & (bob_results != kernel.NO_CLICK)
+    errors = np.count_nonzero(alice_bits[sifted] != bob_results[sifted])
+    return np.count_nonzero(sifted), errors / max(np.count_nonzero(sifted), 1)
+
+if args.sweep:
+    rng = np.random.default_rng()
+    sweep_bits = 1_000_000
+    start = time.perf_counter()
+    print(f"\n{'noise':>6} {'depol':>8} {'bitflip':>8} {'phaseflip':>9} {'eve':>8} {'lossy+eve':>10}")
+    for p in np.linspace(0.0, 0.3, 7):
+        models = [
+            Channel(Depolarizing(p)),
+            Channel(BitFlip(p)),
+            Channel(PhaseFlip(p)),
+            Channel(InterceptResend(p)),
+            Channel(InterceptResend(p), PhotonLoss(0.5, 0.8, 1e-3)),
+        ]
+        qbers = [run_bb84_batch(sweep_bits, model, rng)[1] for model in models]
+        print(f"{p:6.2f} " + " ".join(f"{q:8.4f}" for q in qbers))
+    print(f"Swept {35 * sweep_bits} qubits in {time.perf_counter() - start:.1f} s")
+
+# STEP 8: ENTANGLEMENT-BASED VARIANT (BBM92)
+
+# A source emits Bell pairs (H + CNOT); Alice measures one half and Bob the
+# other, each in a random basis. Pairs measured in the same basis agree. The
+# pairs make this one entangled circuit, which is where --backend tableau
+# pays off for large num_bits.
+
+if args.entangled:
+    pair_qubits = [(cirq.LineQubit(2 * i), cirq.LineQubit(2 * i + 1)) for i in range(num_bits)]
+    bell = cirq.Circuit()
+    for i, (qa, qb) in enumerate(pair_qubits):
+        bell.append([cirq.H(qa), cirq.CNOT(qa, qb)])
+        if alice_bases[i] == 1:
+            bell.append(cirq.H(qa))
+        if bob_bases[i] == 1:
+            bell.append(cirq.H(qb))
+        bell.append([cirq.measure(qa, key=f'a{i}'), cirq.measure(qb, key=f'b{i}')])
+    start = time.perf_counter()
+    pair_result = simulator.run(bell)
+    a_bits = [pair_result.measurements[f'a{i}'].item() for i in range(num_bits)]
+    b_bits = [pair_result.measurements[f'b{i}'].item() for i in range(num_bits)]
+    matched = [i for i in range(num_bits) if alice_bases[i] == bob_bases[i]]
+    errors = sum(a_bits[i] != b_bits[i] for i in matched)
+    print(f"\nBBM92 ({args.backend}): {len(matched)} sifted pairs, {errors} errors, "
+          f"{time.perf_counter() - start:.2f} s for {2 * num_bits} qubits")
@@ -0,0 +1,131 @@
+import secrets
+import threading
+
+import numpy as np
+import pytest
+
+from qkd import auth, engine
+
+
+def random_bits(count):
+    return ''.join(secrets.choice('01') for _ in range(count))
+
+
+def make_pair(tmp_path, bits=8192):
+    pool = random_bits(bits)
+    sessions = []
+    for role in ("alice", "bob"):
+        path = tmp_path / f"pool_{role}.txt"
+        path.write_text(pool)
+        sessions.append(auth.AuthSession(auth.KeyPool(str(path)), role, budget=bits))
+    return sessions
+
+
+def tag_difference(h, a, b):
+    return (h(a).astype(np.int64) - h(b).astype(np.int64)) % auth.P
+
+
+@pytest.mark.parametrize("extended", [b"BASES:0101\x00", b"BASES:0101\x00\x00", b"BASES:0101\x00\x00\x00\x00"])
+def test_padding_and_length_extension_change_tags_with_the_key(extended):
+    # With an unkeyed length word the difference was the same for every key
+    base = b"BASES:0101"
+    differences = {tuple(tag_difference(auth.PolyHash(random_bits(auth.TAG_BITS)), extended, base))
+                   for _ in range(8)}
+    assert len(differences) == 8
+    assert (0, 0, 0, 0) not in differences
+
+
+def test_sign_verify_round_trip(tmp_path):
+    alice, bob = make_pair(tmp_path)
+    for i in range(5):
+        assert bob.verify(alice.sign(f"BASES:{i}:Z,X,Z\n")) == f"BASES:{i}:Z,X,Z\n"
+        assert alice.verify(bob.sign(f"KEEP:{i}:12\n")) == f"KEEP:{i}:12\n"
+
+
+def test_length_extension_forgery_is_rejected(tmp_path):
+    alice, bob = make_pair(tmp_path)
+    message, _, tag = alice.sign("BASES:0101\n").rstrip('\n').rpartition('#')
+    # Shift each lane of the tag by the length difference, as the old hash allowed
+    lanes = [(int(tag[i:i + 8], 16) + 1) % auth.P for i in range(0, len(tag), 8)]
+    forged = message + "\0#" + ''.join(f"{t:08x}" for t in lanes) + "\n"
+    with pytest.raises(auth.AuthenticationError):
+        bob.verify(forged)
+
+
+def test_tampered_message_is_rejected(tmp_path):
+    alice, bob = make_pair(tmp_path)
+    signed = alice.sign("BITS:0:1,0,1\n")
+    with pytest.raises(auth.AuthenticationError):
+        bob.verify(signed.replace("1,0,1", "1,1,1"))
+    with pytest.raises(auth.AuthenticationError):
+        bob.verify("BITS:0:1,0,1\n")
+
+
+def test_unclosed_session_does_not_reuse_pads(tmp_path):
+    # A crash before close() must not leave the reserved pads in the pool
+    path = tmp_path / "pool.txt"
+    path.write_text(random_bits(4096))
+    config = {"auth": 1, "auth_pool_alice": str(path), "auth_budget": 1024}
+    first = auth.open_session(config, "alice", str(tmp_path))
+    first.sign("BASES:0:Z\n")
+    assert len(path.read_text()) == 4096 - 1024
+    second = auth.open_session(config, "alice", str(tmp_path))
+    assert second.key != first.key
+
+
+def test_close_refunds_unused_bits_only_on_success(tmp_path):
+    path = tmp_path / "pool.txt"
+    bits = random_bits(4096)
+    path.write_text(bits)
+    session = auth.AuthSession(auth.KeyPool(str(path)), "alice", budget=1024)
+    session.sign("BASES:0:Z\n")
+    used = session.used_bits()
+    session.close(True)
+    assert path.read_text() == bits[used:]
+
+    # An aborted session burns its whole reservation
+    session = auth.AuthSession(auth.KeyPool(str(path)), "alice", budget=1024)
+    session.close(False)
+    assert path.read_text() == bits[used + 1024:]
+
+
+class TamperBases(engine.Transport):
+    # Bob's end of a loopback link with an attacker flipping his first announced basis
+    def __init__(self, inner):
+        self.inner = inner
+
+    def send(self, message):
+        if message.startswith("BASES:0:"):
+            rest = message[len("BASES:0:"):]
+            message = "BASES:0:" + ("X" if rest[0] == "Z" else "Z") + rest[1:]
+        self.inner.send(message)
+
+    def readline(self):
+        return self.inner.readline()
+
+    def close(self):
+        self.inner.close()
+
+
+def test_engine_aborts_on_a_tampered_message(tmp_path):
+    bits = random_bits(65536)
+    config = {"num_bits": 256, "error_bits": 10, "auth": 1, "auth_budget": 8192}
+    for role in ("alice", "bob"):
+        (tmp_path / f"{role}.txt").write_text(bits)
+        config[f"auth_pool_{role}"] = str(tmp_path / f"{role}.txt")
+    logs = []
+    alice = engine.Alice(config, log=lambda *parts: logs.append(''.join(map(str, parts))))
+    bob = engine.Bob(config, log=None)
+    alice_end, bob_end = engine.loopback()
+    results = {}
+    thread = threading.Thread(target=lambda: results.update(alice=alice.run(alice_end)))
+    thread.start()
+    results["bob"] = bob.run(TamperBases(bob_end))
+    bob_end.close()
+    thread.join(10)
+    assert results == {"alice": "aborted", "bob": "aborted"}
+    assert any("Authentication failed" in line for line in logs)
+    assert alice.key == bob.key == ''
+    # Both sides burn the same reservation, so the pools stay in step
+    alice_pool = (tmp_path / "alice.txt").read_text()
+    assert alice_pool == (tmp_path / "bob.txt").read_text() == bits[8192:]
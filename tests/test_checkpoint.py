@@ -0,0 +1,107 @@
+import threading
+
+from qkd import checkpoint, engine
+
+
+class DropAfterKeeps(engine.Transport):
+    # Bob's end of a loopback link that goes dead after `keeps` finished blocks
+    def __init__(self, inner, keeps):
+        self.inner = inner
+        self.keeps = keeps
+
+    def send(self, message):
+        self.inner.send(message)
+
+    def readline(self):
+        if self.keeps == 0:
+            return ''
+        line = self.inner.readline()
+        if line.startswith('KEEP:'):
+            self.keeps -= 1
+        return line
+
+    def close(self):
+        self.inner.close()
+
+
+def run_session(config, alice_journal, bob_journal, keeps=None, log=None):
+    alice = engine.Alice(config, journal=alice_journal, log=log)
+    bob = engine.Bob(config, journal=bob_journal, log=None)
+    alice_end, bob_end = engine.loopback()
+    if keeps is not None:
+        bob_end = DropAfterKeeps(bob_end, keeps)
+    results = {}
+    thread = threading.Thread(target=lambda: results.update(alice=alice.run(alice_end)))
+    thread.start()
+    results["bob"] = bob.run(bob_end)
+    bob_end.close()
+    thread.join(10)
+    alice_end.close()
+    return results, alice.key, bob.key
+
+
+def test_pack_round_trip():
+    for bits in ('', '1', '0110', '10110011101'):
+        assert checkpoint.unpack_bits(checkpoint.pack_bits(bits), len(bits)) == bits
+
+
+def test_session_resumes_after_a_drop(tmp_path):
+    config = {"num_bits": 3000, "error_bits": 10, "max_block_bits": 300, "checkpoint": 1}
+    alice_path, bob_path = str(tmp_path / "alice.jsonl"), str(tmp_path / "bob.jsonl")
+
+    results, _, _ = run_session(config, checkpoint.Journal(alice_path), checkpoint.Journal(bob_path), keeps=3)
+    assert results == {"alice": "dropped", "bob": "dropped"}
+    # Both journals survive the drop on disk, with the blocks Bob finished
+    alice_journal, bob_journal = checkpoint.Journal(alice_path), checkpoint.Journal(bob_path)
+    assert alice_journal.session == bob_journal.session
+    assert len(bob_journal.blocks) == 3
+    kept = bob_journal.key()
+    assert alice_journal.key().startswith(kept)
+
+    logs = []
+    results, alice_key, bob_key = run_session(config, alice_journal, bob_journal,
+                                              log=lambda *parts: logs.append(''.join(map(str, parts))))
+    assert results == {"alice": "done", "bob": "done"}
+    assert any(line.startswith("Alice: Resuming") for line in logs)
+    assert alice_key == bob_key
+    assert alice_key.startswith(kept) and len(alice_key) > len(kept)
+    # A finished session clears its journal
+    assert checkpoint.Journal(alice_path).session is None
+
+
+def test_new_session_when_journals_disagree(tmp_path):
+    config = {"num_bits": 600, "error_bits": 10, "max_block_bits": 300}
+    alice_journal = checkpoint.Journal(str(tmp_path / "alice.jsonl"))
+    alice_journal.start("stale-session")
+    alice_journal.add_block({"id": 0, "n": 300, "bits": "1010", "errors": 0, "samples": 10})
+    logs = []
+    results, alice_key, bob_key = run_session(config, alice_journal, checkpoint.Journal(),
+                                              log=lambda *parts: logs.append(''.join(map(str, parts))))
+    assert results == {"alice": "done", "bob": "done"}
+    assert alice_key == bob_key
+    assert not any(line.startswith("Alice: Resuming") for line in logs)
+
+
+def test_seeded_resume_redraws_the_rolled_back_blocks(tmp_path):
+    # One block in flight, so the saved generator states fall on block boundaries
+    config = {"num_bits": 3000, "error_bits": 10, "max_block_bits": 300, "checkpoint": 1,
+              "seed": 4, "pipeline_depth": 1}
+    _, unbroken, _ = run_session(config, checkpoint.Journal(), checkpoint.Journal())
+    alice_path, bob_path = str(tmp_path / "alice.jsonl"), str(tmp_path / "bob.jsonl")
+    run_session(config, checkpoint.Journal(alice_path), checkpoint.Journal(bob_path), keeps=3)
+    results, alice_key, bob_key = run_session(config, checkpoint.Journal(alice_path), checkpoint.Journal(bob_path))
+    assert results == {"alice": "done", "bob": "done"}
+    assert alice_key == bob_key == unbroken
+
+
+def test_rollback_restores_the_kept_blocks_state(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = checkpoint.Journal(path)
+    journal.start("session", {"at": 0})
+    for i in range(3):
+        journal.add_block({"id": i, "n": 8, "bits": "1"}, {"at": i + 1})
+    journal.rollback(2)
+    assert journal.rng_state == {"at": 2}
+    assert checkpoint.Journal(path).rng_state == {"at": 2}
+    journal.rollback(0)
+    assert checkpoint.Journal(path).rng_state == {"at": 0}
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from qkd import engine, randomness
+
+
+def run(config):
+    logs = []
+    alice = engine.Alice(config, log=lambda *parts: logs.append(''.join(map(str, parts))))
+    bob = engine.Bob(config, log=None)
+    result, alice_key, bob_key = engine.generate_key(config, alice, bob)
+    return result, alice_key, bob_key, logs
+
+
+@pytest.mark.parametrize("protocol", ["bb84", "six_state", "decoy"])
+def test_loopback_keys_agree(protocol):
+    result, alice_key, bob_key, _ = run({"num_bits": 1024, "error_bits": 16, "protocol": protocol})
+    assert result == "done"
+    assert alice_key and alice_key == bob_key
+
+
+def test_streamed_blocks_agree():
+    result, alice_key, bob_key, _ = run({"num_bits": 3000, "error_bits": 10, "max_block_bits": 300})
+    assert result == "done"
+    assert alice_key and alice_key == bob_key
+
+
+def test_eavesdropper_aborts_the_session():
+    result, alice_key, bob_key, _ = run({"num_bits": 1024, "error_bits": 256, "eve_fraction": 1.0, "seed": 1})
+    assert result == "aborted"
+    assert alice_key == bob_key == ''
+
+
+def test_target_mode_reaches_the_target():
+    result, alice_key, bob_key, _ = run({"num_bits": 64, "error_bits": 10, "target_key_bits": 300})
+    assert result == "done"
+    assert len(alice_key) == 300
+    assert alice_key == bob_key
+
+
+def test_target_mode_stops_when_blocks_yield_no_key():
+    # QBER around 15%: below the abort threshold, above what can be distilled
+    config = {"num_bits": 64, "error_bits": 200, "target_key_bits": 200, "bit_flip": 0.15,
+              "phase_flip": 0.15, "abort_threshold": 0.3, "max_empty_blocks": 5}
+    result, alice_key, _, logs = run(config)
+    assert result == "aborted"
+    assert alice_key == ''
+    assert any("blocks in a row yielded no secure key" in line for line in logs)
+
+
+def test_target_mode_rejects_an_expected_qber_without_key():
+    config = {"num_bits": 64, "error_bits": 10, "target_key_bits": 200, "expected_qber": 0.15}
+    result, _, _, logs = run(config)
+    assert result == "aborted"
+    assert "cannot be reached" in logs[-1]
+
+
+def test_seeded_sessions_are_reproducible():
+    config = {"num_bits": 256, "error_bits": 10, "seed": 3}
+    first = run(config)
+    second = run(config)
+    assert first[0] == "done"
+    assert first[1] == first[2] == second[1]
+
+
+def test_seeded_roles_draw_independent_streams():
+    # Bob's bases must not replay Alice's bits when both read the same seed
+    alice, bob = randomness.source(7, "alice"), randomness.source(7, "bob")
+    assert not np.array_equal(alice.bits(256), bob.integers(2, 256))
+    assert not np.array_equal(randomness.generator(7, "alice").random(8), randomness.generator(7, "bob").random(8))
+
+
+def test_os_random_handles_empty_draws():
+    source = randomness.OsRandom(chunk_bytes=64)
+    assert len(source.bytes(0)) == len(source.bits(0)) == 0
+    assert len(source.bytes(200)) == 200
+
+
+@pytest.mark.parametrize("max_block", [100000, 4000])
+def test_qber_below_the_threshold_finishes(max_block):
+    # About 18% QBER: below the 0.2 threshold, so neither a single block nor
+    # a streamed session may be aborted for it
+    config = {"num_bits": 12000, "error_bits": 1000, "bit_flip": 0.17, "phase_flip": 0.17,
+              "max_block_bits": max_block, "seed": 5}
+    result, _, _, logs = run(config)
+    assert result == "done"
+    assert not any("Aborting" in line for line in logs)
+
+
+def test_finite_mode_ignores_the_fixed_threshold():
+    # The 2% QBER is above abort_threshold, but finite mode sizes the key
+    # from its own bound instead
+    config = {"num_bits": 40000, "error_bits": 10, "eps_sec": 1e-9, "expected_qber": 0.03,
+              "bit_flip": 0.02, "phase_flip": 0.02, "abort_threshold": 0.01,
+              "max_block_bits": 20000, "seed": 2}
+    result, alice_key, _, logs = run(config)
+    assert result == "done"
+    assert alice_key
+    assert not any("Aborting" in line for line in logs)
+
+
+@pytest.mark.parametrize("protocol", ["b92", "e91", "bb48"])
+def test_scripts_refuse_protocols_they_cannot_run(protocol):
+    with pytest.raises(ValueError):
+        engine.Alice({"num_bits": 64, "error_bits": 4, "protocol": protocol}, log=None)
@@ -0,0 +1,40 @@
+import subprocess
+import sys
+import tempfile
+import time
+
+import pytest
+
+from qkd import instance
+
+# Stands in for a script (or a warm worker running one) still holding the pid file
+SLEEPER = [sys.executable, "-c", "import time; time.sleep(30)", "classical_test.py"]
+
+
+@pytest.fixture
+def sleeper(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    proc = subprocess.Popen(SLEEPER)
+    time.sleep(0.2)
+    yield proc
+    proc.kill()
+    proc.wait()
+
+
+def record(proc, when):
+    with open(instance.pid_path("classical_test"), "w") as f:
+        f.write(f"{proc.pid} {when}")
+
+
+def test_previous_copy_is_stopped(sleeper):
+    record(sleeper, time.time())
+    instance.replace_previous("classical_test.py")
+    assert sleeper.wait(5) is not None
+
+
+def test_process_started_after_the_record_is_left_alone(sleeper):
+    # The recorded copy is gone and its pid now belongs to a newer process
+    record(sleeper, time.time() - 60)
+    instance.replace_previous("classical_test.py")
+    time.sleep(0.2)
+    assert sleeper.poll() is None
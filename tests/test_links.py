@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from qkd import links
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+# Echoes every line back until the other side hangs up
+ECHO = """
+import sys
+from qkd import links
+peer = links.connect(sys.argv[1], timeout=10)
+reader = peer.makefile('rb')
+for line in iter(reader.readline, b''):
+    peer.sendall(line)
+peer.close()
+"""
+
+
+def address(kind, tmp_path):
+    return {"tcp": f"tcp:{links.HOST}:0",
+            "unix": f"unix:{tmp_path}/echo.sock"}[kind]
+
+
+@pytest.mark.parametrize("kind", ["tcp", "unix"])
+def test_round_trip(kind, tmp_path):
+    listener = links.listen(address(kind, tmp_path))
+    addr = links.bound(listener)
+    # The peer is another process, as it is for the scripts
+    echo = subprocess.Popen([sys.executable, "-c", ECHO, addr], cwd=ROOT)
+    try:
+        conn, peer = listener.accept()
+        assert links.describe(peer)
+        reader = conn.makefile('rb')
+        for i in range(200):
+            message = f"BASES:{i}:Z,X,Z\n".encode()
+            conn.sendall(message)
+            assert reader.readline() == message
+        # Larger than the socket buffers, so the writer has to wait
+        big = b'x' * (3 << 20) + b'\n'
+        conn.sendall(big)
+        assert reader.readline() == big
+        # A socket stays open while a file made from it is
+        reader.close()
+        conn.close()
+        assert echo.wait(10) == 0
+    finally:
+        if echo.poll() is None:
+            echo.kill()
+        listener.close()
+
+
+def test_connect_without_listener_is_refused(tmp_path):
+    with pytest.raises(OSError):
+        links.connect(f"unix:{tmp_path}/missing.sock", timeout=0.05)
+
+
+def test_parse_rejects_unknown_addresses():
+    with pytest.raises(ValueError):
+        links.parse("udp:localhost:1")
+    with pytest.raises(ValueError):
+        links.parse("shm:qkd")
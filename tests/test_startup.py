@@ -0,0 +1,25 @@
+import os
+import statistics
+import subprocess
+import sys
+
+import pytest
+
+from qkd import startup
+
+
+@pytest.mark.parametrize("name", sorted(startup.SCRIPTS))
+def test_cold_start_within_budget(name):
+    times = startup.cold_start(startup.SCRIPTS[name], runs=3)
+    assert statistics.median(times) <= startup.BUDGET
+
+
+@pytest.mark.parametrize("name", sorted(startup.SCRIPTS))
+def test_cirq_is_not_imported_at_start(name):
+    # cirq alone costs more than the whole budget; only the reference circuits
+    # load it. Ask the loaded interpreter itself, so an indirect import counts too.
+    path = os.path.join(startup.ROOT, startup.SCRIPTS[name])
+    probe = startup.PROBE + "; print('cirq' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", probe, path], cwd=os.path.dirname(path),
+                            check=True, capture_output=True, text=True)
+    assert result.stdout.splitlines()[-1] == "False"
@@ -0,0 +1,38 @@
+import csv
+
+from qkd import sweep
+
+POINTS = sweep.grid(num_bits=[16, 32], error_bits=[2], threshold=[0.2], depolarizing=[0.0], eve_fraction=[0.0])
+
+
+def rows(path):
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def test_resume_skips_finished_points(tmp_path):
+    out = str(tmp_path / "sweep.csv")
+    sweep.run_sweep(POINTS, out, trials=20, workers=1, progress=None)
+    sweep.run_sweep(POINTS, out, trials=20, workers=1, progress=None)
+    assert len(rows(out)) == 2
+
+
+def test_resume_reruns_points_with_other_settings(tmp_path):
+    out = str(tmp_path / "sweep.csv")
+    sweep.run_sweep(POINTS, out, trials=20, workers=1, progress=None)
+    sweep.run_sweep(POINTS, out, trials=30, workers=1, progress=None)
+    sweep.run_sweep(POINTS, out, trials=30, base_seed=1, workers=1, progress=None)
+    assert sorted(int(row['trials']) for row in rows(out)) == [20, 20, 30, 30, 30, 30]
+
+
+def test_resume_drops_a_truncated_row(tmp_path):
+    out = str(tmp_path / "sweep.csv")
+    sweep.run_sweep(POINTS, out, trials=20, workers=1, progress=None)
+    with open(out) as f:
+        text = f.read()
+    # Cut the last row off in the middle, as an interrupted write would
+    with open(out, 'w') as f:
+        f.write(text[:text.rstrip('\n').rindex('\n') + 12])
+    sweep.run_sweep(POINTS, out, trials=20, workers=1, progress=None)
+    assert len(rows(out)) == 2
+    assert all(None not in row.values() for row in rows(out))